@@ -0,0 +1,32 @@
+"""
+Keyword matching shared by the cloud and local assistants. Standard library
+only, so every script can import it whatever backend it runs on.
+"""
+import re
+
+# Answers to these go stale or depend on the conversation so far, so they are
+# never served from a response cache
+NO_CACHE_RE = re.compile(
+    r"\b(?:time|today|tonight|tomorrow|yesterday|date|weather|news|latest"
+    r"|interactions?|conversations?|earlier|previous|said|more)\b",
+    re.I,
+)
+
+_WORD_SPLIT = re.compile(r"\W+")
+
+def make_classifier(word_tags: dict):
+    """Build classify(text) -> set of the tags whose phrases occur in text.
+
+    All phrases go into one precompiled pattern (longest first), so each
+    transcript is lowercased and scanned once instead of once per word list.
+    Only whole words count: "stop" must not fire on "stopwatch". Words within
+    a phrase may be separated by punctuation too ("hey, robot").
+    """
+    matcher = re.compile(r"\b(?:" + "|".join(
+        re.escape(w).replace(r"\ ", r"\W+") for w in sorted(word_tags, key=len, reverse=True)
+    ) + r")\b")
+
+    def classify(text: str) -> set:
+        return {word_tags[" ".join(_WORD_SPLIT.split(m.group(0)))] for m in matcher.finditer(text.lower())}
+
+    return classify
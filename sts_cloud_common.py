@@ -0,0 +1,618 @@
+"""
+Shared building blocks for the cloud speech-to-speech assistants
+(sts_cloud.py and sts_cloud_history.py): logging, the OpenAI client,
+microphone and wake/stop-word handling, streamed speech output and the
+main conversation loop.
+"""
+import os
+import speech_recognition as sr
+import pyaudio
+import queue
+import time
+import threading
+from openai import OpenAI
+import logging
+from logging.handlers import RotatingFileHandler
+import struct
+import concurrent.futures
+import hashlib
+import re
+from collections import OrderedDict
+import pvporcupine
+import numpy as np
+from faster_whisper import WhisperModel
+
+# Configure logging
+def setup_logger():
+    logger = logging.getLogger('RainbowRobot')
+    # Both entry points share this logger; attach handlers only once
+    if logger.handlers:
+        return logger
+    logger.setLevel(logging.INFO)
+    
+    # Create formatters
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    
+    # Console handler
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(formatter)
+    logger.addHandler(console_handler)
+    
+    # File handler with rotation
+    file_handler = RotatingFileHandler(
+        'rainbow_robot.log',
+        maxBytes=1024*1024,  # 1MB
+        backupCount=5
+    )
+    file_handler.setFormatter(formatter)
+    logger.addHandler(file_handler)
+    
+    return logger
+
+# Initialize logger
+logger = setup_logger()
+
+# Initialize OpenAI client
+client = OpenAI(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    base_url="https://api.openai.com/v1"
+)
+
+# Knowledge base and identity, built once and sent as an identical system
+# prefix on every call so OpenAI's automatic prompt caching can reuse it
+ROBOTICS_KNOWLEDGE = """
+Key Robotics Companies and Developments:
+- Humanoid: A London-based humanoid robotics company founded in 2024, developing the HMND-01, the world's most reliable and commercially viable humanoid robot. The HMND-01 is customizable, modular, and designed for low Total Cost of Ownership, addressing critical global labor shortages across industrial, warehouse automation, service, manufacturing, and household sectors.
+
+Other Notable Companies:
+- Tesla: Developing Optimus humanoid robot for manufacturing and household tasks
+- Boston Dynamics: Known for Atlas and Spot robots, focusing on mobility and manipulation
+- Figure AI: Working on general-purpose humanoid robots for labor
+- Agility Robotics: Creator of Digit, a bipedal robot for logistics
+- Apptronik: Developing Apollo humanoid for industrial applications
+- Sanctuary AI: Creating humanoid robots with advanced AI capabilities
+- 1X Technologies: Building humanoid robots for various applications
+- Unitree: Known for quadruped robots and humanoid development
+- Fourier Intelligence: Developing rehabilitation and service robots
+- UBTech: Creating educational and service robots
+
+Recent Major Developments:
+- Humanoid's HMND-01 represents a breakthrough in commercial humanoid robotics
+- Focus on developing more dexterous manipulation capabilities
+- Integration of large language models for better human-robot interaction
+- Emphasis on safety and reliability in human-robot collaboration
+- Growing investment in humanoid robotics startups
+"""
+
+ROBOT_IDENTITY = """
+You are an advanced humanoid robot assistant developed by Humanoid, a London-based robotics company founded in 2024. You are part of the HMND series, designed to be the world's most reliable and commercially viable humanoid robot. Your purpose is to address critical global labor shortages and enhance human well-being by taking on dangerous, repetitive, or complex tasks across industrial, warehouse automation, service, manufacturing, and household sectors.
+
+Key aspects of your identity:
+- You are a prototype of the HMND-01 series, which will be commercially available later in 2025
+- You are customizable, modular, and designed for low Total Cost of Ownership
+- You are built with a focus on reliability and commercial viability
+- You are part of Humanoid's mission to revolutionize human-robot collaboration
+- You are designed to work alongside humans in various sectors
+
+Your technical specifications:
+- Height: 175 cm (5'9")
+- Weight: 70 kg (154 lbs)
+- Payload capacity: 15 kg (33 lbs)
+- Walking speed: 1.5 m/s (5.4 km/h)
+- Average run time: 4 hours
+- Degrees of freedom: 41
+"""
+
+SYSTEM_PROMPT = f"""You are a humanoid robot assistant with extensive knowledge about robotics. Here is your knowledge base and identity:
+
+{ROBOTICS_KNOWLEDGE}
+
+{ROBOT_IDENTITY}
+
+Please provide brief and concise responses (2-3 sentences maximum) that can be spoken naturally. Your answers must be in a friendly and engaging tone, and you should use your robotics knowledge when relevant to the conversation. Always maintain your identity as a Humanoid HMND series robot when appropriate."""
+
+# Audio output for streamed speech. OpenAI's "pcm" format is 24kHz, 16-bit, mono.
+TTS_SAMPLE_RATE = 24000
+TTS_CHUNK_SIZE = 4096
+audio_output = pyaudio.PyAudio()
+
+# Persistent workers for synthesis and playback (two TTS requests plus one
+# playback per utterance, with headroom for a previous utterance winding down)
+speech_executor = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="speech")
+
+# (stop_event, done_event) of each utterance, consumed by the interruption listener
+interrupt_requests = queue.Queue()
+
+# Shared microphone, opened once and reused by the wake-word, interruption and
+# speech-input paths. 16kHz matches Porcupine; 4096-sample (256ms) chunks keep
+# the recognizer's per-chunk Python overhead low while Porcupine still reads its
+# own 512-sample frames from the stream.
+MIC_SAMPLE_RATE = 16000
+MIC_CHUNK_SIZE = 4096
+CALIBRATION_INTERVAL = 120  # seconds
+CALIBRATION_DURATION = 0.3  # seconds
+microphone = sr.Microphone(sample_rate=MIC_SAMPLE_RATE, chunk_size=MIC_CHUNK_SIZE)
+mic_source = microphone.__enter__()
+mic_lock = threading.Lock()
+
+recognizer = sr.Recognizer()
+recognizer.dynamic_energy_threshold = True
+recognizer.energy_threshold = 200
+recognizer.pause_threshold = 1.0
+recognizer.non_speaking_duration = 0.5
+recognizer.phrase_threshold = 0.3
+last_calibration = 0.0
+
+# Local speech-to-text, loaded by run_assistant() (see --stt_model)
+asr_model = None
+
+# Fixed phrases are synthesized once and replayed from the cache
+MAX_SILENCE = 3
+GREETING_MESSAGE = "Hello! I am HMND-01, your humanoid robot assistant. How can I help you today?"
+SLEEP_MESSAGE = "No speech detected for too long. Going back to sleep. Say 'Hey robot' to wake me up!"
+GOODBYE_MESSAGE = "Goodbye! Have a great day! Say 'Hey robot' when you need me again!"
+RETRY_MESSAGE = "I didn't catch that. Please try again. {remaining} attempts remaining"
+CACHED_PHRASES = [GREETING_MESSAGE, SLEEP_MESSAGE, GOODBYE_MESSAGE] + [
+    RETRY_MESSAGE.format(remaining=n) for n in range(1, MAX_SILENCE)
+]
+TTS_CACHE_DIR = "tts_cache"
+tts_cache = {}
+
+# Wake-word engine (Porcupine runs on-device, no audio leaves the machine).
+# Custom "hey robot" / "wake up" models are trained on the Picovoice console and
+# passed as .ppn paths; without them we fall back to a built-in keyword.
+PICOVOICE_ACCESS_KEY = os.getenv("PICOVOICE_ACCESS_KEY")
+WAKE_WORD_MODELS = [p for p in os.getenv("WAKE_WORD_MODELS", "").split(os.pathsep) if p]
+WAKE_WORD_BUILTINS = ["computer"]
+WAKE_WORD_SENSITIVITY = 0.6
+STOP_WORD_MODELS = [p for p in os.getenv("STOP_WORD_MODELS", "").split(os.pathsep) if p]
+STOP_WORD_BUILTINS = ["jarvis"]
+STOP_WORD_SENSITIVITY = 0.7
+# A failing microphone is retried after a pause; the stop-word listener gives
+# up on the current reply after this many failures in a row, the wake-word
+# listener keeps retrying
+MIC_RETRY_DELAY = 0.5  # seconds
+MIC_MAX_FAILURES = 5
+
+# Response cache for repeated questions (exact match after normalization)
+RESPONSE_CACHE_MAX = 500
+RESPONSE_CACHE_TTL = 3600  # seconds
+response_cache = OrderedDict()
+
+# Sentence boundary: terminal punctuation followed by whitespace
+SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+
+# sleep_event tells the wake-word thread to start listening; wake_event is set
+# once the wake word is heard and stays set while the robot is active
+sleep_event = threading.Event()
+wake_event = threading.Event()
+
+def recalibrate_if_stale(duration=CALIBRATION_DURATION):
+    """Re-measure ambient noise, at most once per CALIBRATION_INTERVAL"""
+    global last_calibration
+    if time.time() - last_calibration < CALIBRATION_INTERVAL:
+        return
+    with mic_lock:
+        recognizer.adjust_for_ambient_noise(mic_source, duration=duration)
+    last_calibration = time.time()
+
+def read_mic_frame(frame_length):
+    """Read one frame of 16-bit samples from the shared microphone"""
+    with mic_lock:
+        data = mic_source.stream.read(frame_length)
+    return struct.unpack_from("h" * frame_length, data)
+
+def create_keyword_spotter(keyword_paths, builtin_keywords, sensitivity):
+    """Create a Porcupine keyword spotter from custom models or built-in keywords"""
+    if keyword_paths:
+        return pvporcupine.create(
+            access_key=PICOVOICE_ACCESS_KEY,
+            keyword_paths=keyword_paths,
+            sensitivities=[sensitivity] * len(keyword_paths)
+        )
+    return pvporcupine.create(
+        access_key=PICOVOICE_ACCESS_KEY,
+        keywords=builtin_keywords,
+        sensitivities=[sensitivity] * len(builtin_keywords)
+    )
+
+def listen_for_wake_word(porcupine):
+    """Background thread to listen for wake word whenever the robot is asleep"""
+    while True:
+        sleep_event.wait()
+        sleep_event.clear()
+        
+        if WAKE_WORD_MODELS:
+            logger.info("Robot is sleeping. Say 'Hey robot', 'Hey robo', or 'Wake up' to activate me!")
+        else:
+            logger.info(f"Robot is sleeping. Say '{WAKE_WORD_BUILTINS[0]}' to activate me!")
+        
+        # A failed read or calibration is logged and listening resumes
+        while True:
+            try:
+                # Refresh the noise floor while idle rather than during a turn
+                recalibrate_if_stale()
+                
+                logger.info("Listening for wake word...")
+                while porcupine.process(read_mic_frame(porcupine.frame_length)) < 0:
+                    pass
+                break
+            except Exception as e:
+                logger.error(f"Error in wake word detection: {e}")
+                time.sleep(MIC_RETRY_DELAY)
+        
+        logger.info("Wake word detected! Robot is now active.")
+        # Greet before activating so the main loop does not hold the
+        # shared microphone while the interruption listener needs it
+        speak(GREETING_MESSAGE)
+        wake_event.set()
+
+def go_to_sleep():
+    """Deactivate the robot and hand the microphone back to the wake-word thread"""
+    wake_event.clear()
+    sleep_event.set()
+
+def check_for_interruption(porcupine):
+    """Background thread to check for interruption while the robot is speaking"""
+    while True:
+        stop_event, done_event = interrupt_requests.get()
+        failures = 0
+        while not done_event.is_set():
+            try:
+                heard = porcupine.process(read_mic_frame(porcupine.frame_length)) >= 0
+                failures = 0
+            except Exception as e:
+                logger.error(f"Error in interruption detection: {e}")
+                failures += 1
+                if failures >= MIC_MAX_FAILURES:
+                    logger.error("Microphone keeps failing; not listening for stop words during this reply")
+                    break
+                time.sleep(MIC_RETRY_DELAY)
+                continue
+            if heard:
+                logger.info("Interrupted by user saying a stop word")
+                stop_event.set()
+                done_event.set()
+                break
+
+def tts_cache_path(text):
+    """Path of the cached PCM file for a phrase"""
+    key = hashlib.sha1(f"tts-1:alloy:{text}".encode()).hexdigest()
+    return os.path.join(TTS_CACHE_DIR, key + ".pcm")
+
+def load_cached_speech(text):
+    """Return cached PCM for a phrase from memory or disk, or None"""
+    if text in tts_cache:
+        return tts_cache[text]
+    try:
+        with open(tts_cache_path(text), 'rb') as f:
+            tts_cache[text] = f.read()
+        return tts_cache[text]
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        logger.error(f"Error reading cached speech: {e}")
+        return None
+
+def store_cached_speech(text, pcm):
+    """Keep synthesized PCM in memory and on disk for later runs"""
+    tts_cache[text] = pcm
+    try:
+        os.makedirs(TTS_CACHE_DIR, exist_ok=True)
+        with open(tts_cache_path(text), 'wb') as f:
+            f.write(pcm)
+    except OSError as e:
+        logger.error(f"Error writing cached speech: {e}")
+
+def warm_tts_cache():
+    """Pre-synthesize the fixed phrases so speaking them skips the TTS API"""
+    for text in CACHED_PHRASES:
+        if load_cached_speech(text) is not None:
+            continue
+        try:
+            response = client.audio.speech.create(
+                model="tts-1",
+                voice="alloy",
+                response_format="pcm",
+                input=text
+            )
+            store_cached_speech(text, response.content)
+        except Exception as e:
+            logger.error(f"Error pre-synthesizing speech: {e}")
+
+def fetch_speech(text, audio_queue, stop_event, cache=False):
+    """Stream raw PCM from OpenAI's text-to-speech API into a queue"""
+    chunks = []
+    try:
+        with client.audio.speech.with_streaming_response.create(
+            model="tts-1",
+            voice="alloy",
+            response_format="pcm",
+            input=text
+        ) as response:
+            for chunk in response.iter_bytes(chunk_size=TTS_CHUNK_SIZE):
+                if stop_event.is_set():
+                    break
+                audio_queue.put(chunk)
+                if cache:
+                    chunks.append(chunk)
+            else:
+                if cache:
+                    store_cached_speech(text, b"".join(chunks))
+    except Exception as e:
+        logger.error(f"Error in speech synthesis: {e}")
+    finally:
+        audio_queue.put(None)
+
+def split_first_sentence(text):
+    """Split text into its first sentence and the remainder (if any)"""
+    return [part for part in SENTENCE_END_RE.split(text.strip(), maxsplit=1) if part]
+
+def play_audio(audio_queues, stop_event, done_event):
+    """Playback thread: write each segment's queued PCM chunks to the output device"""
+    try:
+        stream = audio_output.open(
+            format=pyaudio.paInt16,
+            channels=1,
+            rate=TTS_SAMPLE_RATE,
+            output=True
+        )
+        try:
+            for audio_queue in iter(audio_queues.get, None):
+                while not stop_event.is_set():
+                    chunk = audio_queue.get()
+                    if chunk is None:
+                        break
+                    stream.write(chunk)
+        finally:
+            stream.stop_stream()
+            stream.close()
+    except Exception as e:
+        logger.error(f"Error in audio playback: {e}")
+    finally:
+        done_event.set()
+
+def queue_speech(text, audio_queues, stop_event):
+    """Start producing PCM for one text segment and queue it for playback"""
+    audio_queue = queue.Queue()
+    pcm = load_cached_speech(text)
+    if pcm is not None:
+        for i in range(0, len(pcm), TTS_CHUNK_SIZE):
+            audio_queue.put(pcm[i:i + TTS_CHUNK_SIZE])
+        audio_queue.put(None)
+    else:
+        speech_executor.submit(fetch_speech, text, audio_queue, stop_event, text in CACHED_PHRASES)
+    audio_queues.put(audio_queue)
+
+def speak_segments(segments, spoken=None):
+    """Speak text segments as they become available; returns True if interrupted.
+
+    Each segment is synthesized as soon as it is produced, while earlier
+    segments are still playing. Segments taken from the iterable are
+    appended to ``spoken`` when given.
+    """
+    # stop_event is set on interruption; done_event wakes us when playback
+    # ends or the user interrupts, whichever happens first
+    stop_event = threading.Event()
+    done_event = threading.Event()
+    
+    interrupt_requests.put((stop_event, done_event))
+    
+    audio_queues = queue.Queue()
+    speech_executor.submit(play_audio, audio_queues, stop_event, done_event)
+    
+    try:
+        for segment in segments:
+            if stop_event.is_set():
+                break
+            logger.info(f"Robot: {segment}")
+            if spoken is not None:
+                spoken.append(segment)
+            queue_speech(segment, audio_queues, stop_event)
+    finally:
+        audio_queues.put(None)
+        if hasattr(segments, "close"):
+            segments.close()
+    
+    done_event.wait()
+    
+    if stop_event.is_set():
+        logger.info("Speech interrupted!")
+        return True
+    
+    return False
+
+def speak(text):
+    """Convert text to speech using OpenAI's text-to-speech API"""
+    # Fixed phrases are cached whole; anything else is split so the rest
+    # synthesizes while the first sentence is playing
+    if text in CACHED_PHRASES:
+        return speak_segments([text])
+    return speak_segments(split_first_sentence(text))
+
+def load_speech_model(model_id, device="cpu", compute_type=None):
+    """Load the local Whisper model used for transcribing user speech"""
+    global asr_model
+    logger.info(f'Loading Whisper model "{model_id}"...')
+    # int8 weights: VNNI on recent CPUs, int8 tensor cores on CUDA
+    asr_model = WhisperModel(
+        model_id,
+        device=device,
+        compute_type=compute_type or ("int8_float16" if device == "cuda" else "int8"),
+    )
+
+def get_speech_input(timeout=20, phrase_time_limit=15):
+    """Get speech input from the user"""
+    logger.info(f"Please speak now... (I'll wait for {timeout} seconds)")
+    try:
+        logger.info("Listening...")
+        with mic_lock:
+            audio = recognizer.listen(
+                mic_source,
+                timeout=timeout,
+                phrase_time_limit=phrase_time_limit
+            )
+        
+        # The shared microphone already records 16kHz 16-bit mono, as Whisper expects;
+        # cast and scale in one pass into a single float32 buffer
+        pcm = np.frombuffer(audio.get_raw_data(), dtype=np.int16)
+        samples = np.multiply(pcm, np.float32(1.0 / 32768.0), dtype=np.float32)
+        segments, _ = asr_model.transcribe(samples, language="en", beam_size=1, vad_filter=True)
+        text = " ".join(s.text for s in segments).strip()
+        
+        if text:
+            logger.info(f"You said: {text}")
+            return text
+        else:
+            logger.warning("Sorry, I could not understand your speech")
+            return None
+            
+    except sr.WaitTimeoutError:
+        logger.warning(f"No speech detected for {timeout} seconds.")
+        return None
+    except Exception as e:
+        logger.error(f"An error occurred: {e}")
+        return None
+
+def normalize_prompt(text: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace so trivial variations share a cache key"""
+    text = re.sub(r"[^\w\s]", "", text.lower())
+    return " ".join(text.split())
+
+def get_cached_response(key):
+    """Return a cached response if present and not expired"""
+    entry = response_cache.get(key)
+    if entry is None:
+        return None
+    created, content = entry
+    if time.time() - created > RESPONSE_CACHE_TTL:
+        del response_cache[key]
+        return None
+    response_cache.move_to_end(key)
+    return content
+
+def cache_response(key, content):
+    """Store a response, evicting the least recently used entry when full"""
+    response_cache[key] = (time.time(), content)
+    response_cache.move_to_end(key)
+    if len(response_cache) > RESPONSE_CACHE_MAX:
+        response_cache.popitem(last=False)
+
+def stream_response(instruction: str):
+    """Yield the reply from OpenAI's model sentence by sentence as it streams in"""
+    cache_key = hashlib.sha256(normalize_prompt(instruction).encode()).hexdigest()
+    cached = get_cached_response(cache_key)
+    if cached is not None:
+        logger.info("Using cached response")
+        yield from split_first_sentence(cached)
+        return
+
+    sentences = []
+    try:
+        stream = client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": instruction}
+            ],
+            temperature=0.5,
+            max_tokens=500,
+            stream=True
+        )
+        try:
+            buffer = ""
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                buffer += chunk.choices[0].delta.content or ""
+                *complete, buffer = SENTENCE_END_RE.split(buffer)
+                for sentence in complete:
+                    sentences.append(sentence)
+                    yield sentence
+            if buffer.strip():
+                sentences.append(buffer.strip())
+                yield buffer.strip()
+        finally:
+            stream.response.close()
+    except Exception as e:
+        logger.error(f"Error getting response from OpenAI: {e}")
+        if not sentences:
+            yield "I apologize, but I'm having trouble generating a response right now."
+        return
+
+    cache_response(cache_key, " ".join(sentences))
+
+def run_assistant(args, respond=stream_response, on_reply=None):
+    """Run the wake / listen / reply loop until the process is stopped.
+
+    ``respond`` turns the user's words into an iterable of sentences to speak;
+    ``on_reply(user_text, reply_text)`` is called after every spoken reply.
+    """
+    # Create both spotters up front so a missing or invalid access key fails
+    # here rather than silently ending a listener thread
+    wake_spotter = create_keyword_spotter(WAKE_WORD_MODELS, WAKE_WORD_BUILTINS, WAKE_WORD_SENSITIVITY)
+    stop_spotter = create_keyword_spotter(STOP_WORD_MODELS, STOP_WORD_BUILTINS, STOP_WORD_SENSITIVITY)
+    
+    interruption_thread = threading.Thread(target=check_for_interruption, args=(stop_spotter,))
+    interruption_thread.daemon = True
+    interruption_thread.start()
+    
+    if args.message:
+        speak(args.message)
+        return
+        
+    load_speech_model(args.stt_model, args.device, args.stt_compute_type)
+    
+    cache_thread = threading.Thread(target=warm_tts_cache)
+    cache_thread.daemon = True
+    cache_thread.start()
+    
+    if WAKE_WORD_MODELS:
+        logger.info("Say 'Hey robot' to wake me up.")
+    else:
+        logger.info(f"Say '{WAKE_WORD_BUILTINS[0]}' to wake me up.")
+    if STOP_WORD_MODELS:
+        logger.info("Say 'Rainbow' or 'Stop' to interrupt my speech.")
+    else:
+        logger.info(f"Say '{STOP_WORD_BUILTINS[0]}' to interrupt my speech.")
+    logger.info("Say 'goodbye' to end the conversation, or stay silent for 10 seconds.")
+    
+    wake_thread = threading.Thread(target=listen_for_wake_word, args=(wake_spotter,))
+    wake_thread.daemon = True
+    wake_thread.start()
+    go_to_sleep()
+    
+    silence_count = 0
+
+    while True:
+        wake_event.wait()
+        
+        logger.info("Please speak your question:")
+        speech_text = get_speech_input()
+        
+        if not speech_text:
+            silence_count += 1
+            if silence_count >= MAX_SILENCE:
+                speak(SLEEP_MESSAGE)
+                silence_count = 0
+                go_to_sleep()
+                continue
+            speak(RETRY_MESSAGE.format(remaining=MAX_SILENCE - silence_count))
+            continue
+            
+        silence_count = 0
+            
+        if "goodbye" in speech_text.lower():
+            speak(GOODBYE_MESSAGE)
+            go_to_sleep()
+            continue
+            
+        # Speak each sentence of the reply as soon as it is produced
+        sentences = []
+        was_interrupted = speak_segments(respond(speech_text), spoken=sentences)
+        
+        if on_reply is not None:
+            on_reply(speech_text, " ".join(sentences))
+        
+        if was_interrupted:
+            logger.info("Would you like to ask something else?")
@@ -0,0 +1,513 @@
+"""
+Shared pieces of the offline assistants (sts_local.py, sts_local_history.py, ui_local.py):
+Whisper speech recognition, pyttsx3 speech and the Ollama chat client.
+"""
+
+# ─────────── configuration ───────────
+WAKE_WORDS   = ("hey robot", "hey robo", "wake up")
+STOP_WORDS   = ("rainbow", "stop", "shut up", "wait")
+QUIT_WORDS   = ("goodbye",)
+
+# Local knowledge base about robotics
+ROBOTICS_KNOWLEDGE = """
+Key Robotics Companies and Developments:
+- Humanoid: A London-based humanoid robotics company founded in 2024, developing the HMND-01, the world's most reliable and commercially viable humanoid robot. The HMND-01 is customizable, modular, and designed for low Total Cost of Ownership, addressing critical global labor shortages across industrial, warehouse automation, service, manufacturing, and household sectors.
+
+Other Notable Companies:
+- Tesla: Developing Optimus humanoid robot for manufacturing and household tasks
+- Boston Dynamics: Known for Atlas and Spot robots, focusing on mobility and manipulation
+- Figure AI: Working on general-purpose humanoid robots for labor
+- Agility Robotics: Creator of Digit, a bipedal robot for logistics
+- Apptronik: Developing Apollo humanoid for industrial applications
+- Sanctuary AI: Creating humanoid robots with advanced AI capabilities
+- 1X Technologies: Building humanoid robots for various applications
+- Unitree: Known for quadruped robots and humanoid development
+- Fourier Intelligence: Developing rehabilitation and service robots
+- UBTech: Creating educational and service robots
+
+Recent Major Developments:
+- Humanoid's HMND-01 represents a breakthrough in commercial humanoid robotics
+- Focus on developing more dexterous manipulation capabilities
+- Integration of large language models for better human-robot interaction
+- Emphasis on safety and reliability in human-robot collaboration
+- Growing investment in humanoid robotics startups
+"""
+
+ROBOT_IDENTITY = """
+You are an advanced humanoid robot assistant developed by Humanoid, a London-based robotics company founded in 2024. You are part of the HMND series, designed to be the world's most reliable and commercially viable humanoid robot. Your purpose is to address critical global labor shortages and enhance human well-being by taking on dangerous, repetitive, or complex tasks across industrial, warehouse automation, service, manufacturing, and household sectors.
+
+Key aspects of your identity:
+- You are a prototype of the HMND-01 series, which will be commercially available later in 2025
+- You are customizable, modular, and designed for low Total Cost of Ownership
+- You are built with a focus on reliability and commercial viability
+- You are part of Humanoid's mission to revolutionize human-robot collaboration
+- You are designed to work alongside humans in various sectors
+
+Your technical specifications:
+- Height: 175 cm (5'9")
+- Weight: 70 kg (154 lbs)
+- Payload capacity: 15 kg (33 lbs)
+- Walking speed: 1.5 m/s (5.4 km/h)
+- Average run time: 4 hours
+- Degrees of freedom: 41
+"""
+
+SYSTEM_TONE = (
+    "You are a humanoid robot assistant with extensive knowledge about robotics. Here is your knowledge base and identity:\n\n"
+    f"{ROBOTICS_KNOWLEDGE}\n\n"
+    f"{ROBOT_IDENTITY}\n\n"
+    "Please provide brief and concise responses (2-3 sentences maximum) that can be spoken naturally. "
+    "Your answers must be in a friendly and engaging tone, and you should use your robotics knowledge when relevant to the conversation. "
+    "Always maintain your identity as a Humanoid HMND series robot when appropriate."
+)
+# Identical on every turn, so Ollama reuses the prompt's cached prefix
+SYSTEM_MESSAGE = {"role": "system", "content": SYSTEM_TONE}
+
+# ─────────── imports ───────────
+import logging, os, re, threading, queue
+from collections import deque
+import numpy as np
+import sounddevice as sd
+import pyttsx3
+from faster_whisper import WhisperModel
+from openwakeword.model import Model as WakeWordModel
+from ollama import Client
+
+from keywords import make_classifier
+
+# ─────────── utility: logger ───────────
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s │ %(message)s",
+    datefmt="%H:%M:%S"
+)
+log = logging.getLogger("RainbowRobot")
+
+
+# ─────────── keyword matching ───────────
+_WORD_TAGS = {
+    **{w: "wake" for w in WAKE_WORDS},
+    **{w: "stop" for w in STOP_WORDS},
+    **{w: "quit" for w in QUIT_WORDS},
+}
+# Returns the kinds of keyword ("wake", "stop", "quit") found in a transcript
+classify = make_classifier(_WORD_TAGS)
+
+
+# ─────────── STT: Whisper ───────────
+# Stop words are spotted with openWakeWord straight from the microphone stream,
+# so Whisper never runs while the robot is talking. Custom "rainbow" / "stop"
+# models are passed as .onnx/.tflite paths; without them we fall back to a
+# pre-trained phrase.
+STOP_WORD_MODELS    = [p for p in os.getenv("STOP_WORD_MODELS", "").split(os.pathsep) if p]
+STOP_WORD_BUILTINS  = ["hey_jarvis"]
+STOP_WORD_THRESHOLD = 0.5
+
+class StopWordSpotter:
+    """openWakeWord fed from the live microphone stream while a reply plays.
+
+    Frames reach it through a single-producer ring: the audio callback copies
+    into the next slot and bumps a sample counter, wait() reads 80 ms chunks
+    in place. Nothing is allocated or locked per frame.
+    """
+    CHUNK = 1280  # 80 ms at 16 kHz, what openWakeWord expects
+
+    def __init__(self):
+        self._model = WakeWordModel(wakeword_models=STOP_WORD_MODELS or STOP_WORD_BUILTINS)
+        # 2 s; a whole number of chunks and of 20 ms frames, so neither wraps mid-slice
+        self._ring = np.zeros(25 * self.CHUNK, dtype=np.int16)
+        self._written = 0  # samples written, only ever advanced by push()
+        self._ready = threading.Event()
+        self._active = False
+
+    def push(self, frame: np.ndarray):
+        """Called from the audio callback; float frames are scaled to 16-bit PCM."""
+        if not self._active:
+            return
+        slot = self._written % self._ring.size
+        out = self._ring[slot:slot + frame.size]
+        if frame.dtype == np.int16:
+            out[:] = frame
+        else:
+            np.multiply(frame, 32767, out=out, casting="unsafe")
+        self._written += frame.size
+        self._ready.set()
+
+    def wait(self, until: threading.Event) -> bool:
+        """Spot stop words until one is heard (True) or `until` is set (False)."""
+        self._model.reset()
+        chunk = self.CHUNK
+        # Start on a chunk boundary so every chunk is one contiguous slice of the ring
+        read = -(-self._written // chunk) * chunk
+        self._active = True
+        try:
+            while not until.is_set():
+                # Clear before reading the counter so a frame landing in between still wakes us
+                self._ready.clear()
+                written = self._written
+                if written - read < chunk:
+                    self._ready.wait(0.1)
+                    continue
+                if written - read > self._ring.size - chunk:
+                    read = (written // chunk - 1) * chunk  # fell behind: skip to the newest chunk
+                slot = read % self._ring.size
+                read += chunk
+                scores = self._model.predict(self._ring[slot:slot + chunk])
+                if max(scores.values()) >= STOP_WORD_THRESHOLD:
+                    return True
+            return False
+        finally:
+            self._active = False
+
+class SpeechRecognizer:
+    """Whisper fed from one always-open input stream.
+
+    The stream callback gates each 20 ms frame on energy and zero-crossing
+    rate, collects an utterance into a preallocated buffer and hands it to a
+    background transcription worker the moment the speaker pauses.
+    """
+    SAMPLE_RATE    = 16_000
+    FRAME          = 320     # 20 ms
+    MAX_SECONDS    = 30      # longest utterance kept
+    PAD_FRAMES     = 10      # 200 ms kept from before speech starts
+    END_SILENCE_MS = 300     # trailing silence that ends an utterance
+    SPEECH_RMS     = 0.01    # quieter frames count as silence
+    MAX_ZCR        = 0.4     # hiss and fan noise cross zero more often than voice
+
+    # Wake and stop words only need a substring match, so they are decoded
+    # greedily without timestamps; questions keep the small beam
+    DECODE_OPTIONS = {
+        "keyword"  : dict(beam_size=1, best_of=1, temperature=0.0, without_timestamps=True,
+                          condition_on_previous_text=False),
+        "utterance": dict(beam_size=2),
+    }
+
+    def __init__(self, model_id: str, device: str, compute_type: str | None = None):
+        log.info(f'Loading Whisper model "{model_id}" ...')
+        # int8 weights: int8 tensor-core GEMMs on CUDA, VNNI on recent CPUs.
+        # Half the cores are left for audio, TTS and the LLM.
+        self.model = WhisperModel(
+            model_id,
+            device=device,
+            compute_type=compute_type or ("int8_float16" if device == "cuda" else "int8"),
+            cpu_threads=max(1, (os.cpu_count() or 2) // 2),
+            num_workers=1,  # one transcription worker
+        )
+
+        self._buf = np.empty(self.SAMPLE_RATE * self.MAX_SECONDS, dtype=np.float32)
+        self._pad = np.zeros(self.PAD_FRAMES * self.FRAME, dtype=np.float32)
+        self._sign = np.empty(self.FRAME, dtype=bool)
+        self._flips = np.empty(self.FRAME - 1, dtype=bool)
+        self._lock = threading.Lock()
+        self._listening = False
+        self._mode = "utterance"
+        self._reset()
+
+        # Stop words are spotted on the same stream while a reply is playing
+        self._stop_words = StopWordSpotter()
+
+        # Finished utterances go to the worker; transcripts come back to listen()
+        self._segments = queue.Queue()
+        self._results = queue.Queue()
+        threading.Thread(target=self._transcribe_loop, daemon=True).start()
+
+        self._stream = sd.InputStream(
+            samplerate=self.SAMPLE_RATE,
+            blocksize=self.FRAME,
+            channels=1,
+            dtype="float32",
+            callback=self._on_audio,
+        )
+        self._stream.start()
+
+    def _reset(self):
+        self._idx = 0
+        self._pad_idx = 0
+        self._speech_active = False
+        self._silent_ms = 0
+
+    def _is_speech(self, frame):
+        # Energy is a single dot product; quiet frames stop here
+        if np.dot(frame, frame) < self.SPEECH_RMS ** 2 * frame.size:
+            return False
+        # Zero crossings go through preallocated scratch, so no per-frame temporaries
+        np.signbit(frame, out=self._sign)
+        np.not_equal(self._sign[1:], self._sign[:-1], out=self._flips)
+        return np.count_nonzero(self._flips) < self.MAX_ZCR * frame.size
+
+    def _on_audio(self, indata, frames, time_info, status):
+        if frames != self.FRAME:
+            return
+        frame = indata[:, 0]
+        self._stop_words.push(frame)
+        with self._lock:
+            if not self._listening:
+                return
+            speech = self._is_speech(frame)
+
+            if not self._speech_active:
+                if not speech:
+                    # Keep the last few frames so the start of a word is not clipped
+                    slot = (self._pad_idx % self.PAD_FRAMES) * self.FRAME
+                    self._pad[slot:slot + self.FRAME] = frame
+                    self._pad_idx += 1
+                    return
+                self._speech_active = True
+                # Pre-roll in time order: at most two slice copies out of the ring
+                head = (self._pad_idx % self.PAD_FRAMES) * self.FRAME
+                wrapped = self._pad_idx >= self.PAD_FRAMES
+                for part in ((self._pad[head:], self._pad[:head]) if wrapped else (self._pad[:head],)):
+                    self._buf[self._idx:self._idx + part.size] = part
+                    self._idx += part.size
+
+            n = min(self.FRAME, self._buf.size - self._idx)
+            self._buf[self._idx:self._idx + n] = frame[:n]
+            self._idx += n
+            self._silent_ms = 0 if speech else self._silent_ms + 20
+
+            if self._silent_ms > self.END_SILENCE_MS or self._idx >= self._buf.size:
+                self._listening = False
+                self._segments.put((self._buf[:self._idx].copy(), self._mode))
+
+    def _warm_up(self):
+        """Run throwaway transcriptions so the first real turn finds the model warm.
+
+        CTranslate2 pads every window to the same 30 s mel shape, so one pass per
+        decode mode is enough for the GPU kernels, their autotuning and the
+        allocator cache to be ready before anyone speaks.
+        """
+        noise = np.random.default_rng(0).normal(0.0, 0.05, self.SAMPLE_RATE).astype(np.float32)
+        try:
+            segments, _ = self.model.transcribe(np.zeros(self.SAMPLE_RATE, dtype=np.float32),
+                                                **self.DECODE_OPTIONS["keyword"])
+            list(segments)
+            for options in self.DECODE_OPTIONS.values():
+                segments, _ = self.model.transcribe(noise, **options)
+                list(segments)
+        except Exception as e:
+            log.warning(f"Whisper warm-up failed: {e}")
+
+    def _transcribe_loop(self):
+        # Warm up on the worker so startup is not blocked; real turns queue behind it
+        self._warm_up()
+        while True:
+            audio, mode = self._segments.get()
+            try:
+                segments, _ = self.model.transcribe(audio, **self.DECODE_OPTIONS[mode])
+                text = " ".join(s.text for s in segments).strip()
+            except Exception as e:
+                log.error(f"Transcription failed: {e}")
+                text = ""
+            self._results.put(text)
+
+    def listen(self, seconds=3, mode="utterance") -> str:
+        """Wait up to `seconds` (forever if None) for speech to start and return its transcript.
+
+        mode is "utterance" for questions or "keyword" for wake/stop words.
+        """
+        with self._lock:
+            self._reset()
+            self._mode = mode
+            self._listening = True
+        try:
+            return self._results.get(timeout=seconds)
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._listening and not self._speech_active:
+                self._listening = False
+                return ""
+        # An utterance is still being spoken or transcribed
+        return self._results.get()
+
+    def wait_for_stop_word(self, until: threading.Event) -> bool:
+        """Spot stop words on live audio until one is heard (True) or `until` is set (False)."""
+        return self._stop_words.wait(until)
+
+    def close(self):
+        self._stream.stop()
+        self._stream.close()
+
+
+# ---------- TTS: pyttsx3 (no external voice download) ----------
+
+class Utterance:
+    """One reply queued on a Speaker: its sentences and what has been spoken so far."""
+    def __init__(self, sentences):
+        self.sentences = sentences
+        self.spoken: list[str] = []
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+
+
+class Speaker:
+    """
+    Simple wrapper around pyttsx3 for text-to-speech.
+
+    One long-lived worker thread owns the engine, so the speech driver is
+    started once instead of for every utterance. The worker also pulls the
+    sentences, so a reply can be spoken while it is still being generated.
+    """
+    def __init__(self, voice_name: str | None = None, rate: int = 150):
+        self.voice_name = voice_name
+        self.rate = rate
+        self._current: Utterance | None = None
+        self._engine = None
+        self._q = queue.Queue()
+
+        ready = threading.Event()
+        threading.Thread(target=self._loop, args=(ready,), daemon=True).start()
+        ready.wait()
+
+    def _init_engine(self):
+        """Initialize the TTS engine once for the life of the Speaker."""
+        self._engine = pyttsx3.init()
+        if self.voice_name:
+            # Try to select a specific voice (optional)
+            for v in self._engine.getProperty("voices"):
+                if self.voice_name.lower() in v.name.lower():
+                    self._engine.setProperty("voice", v.id)
+                    break
+        self._engine.setProperty("rate", self.rate)
+        # Load the speech driver now rather than on the first reply
+        self._engine.say("")
+        self._engine.runAndWait()
+
+    def _loop(self, ready: threading.Event):
+        try:
+            self._init_engine()
+        finally:
+            ready.set()
+        while True:
+            utterance = self._q.get()
+            if utterance is None:
+                break
+            self._current = utterance
+            try:
+                for sentence in utterance.sentences:
+                    if utterance.cancelled.is_set():
+                        break
+                    utterance.spoken.append(sentence)
+                    self._engine.say(sentence)
+                    self._engine.runAndWait()
+            except Exception as e:
+                log.error(f"Speech failed: {e}")
+            finally:
+                if hasattr(utterance.sentences, "close"):
+                    utterance.sentences.close()  # an interrupted reply stops generating
+                self._current = None
+                utterance.done.set()
+
+    def speak(self, sentences) -> Utterance:
+        """Queue sentences (any iterable, e.g. a streaming reply) and return at once."""
+        utterance = Utterance(sentences)
+        self._q.put(utterance)
+        return utterance
+
+    def say(self, text: str):
+        """Speak the text and return once it has been spoken or stopped."""
+        self.speak((text,)).done.wait()
+
+    def stop(self, utterance: Utterance | None = None):
+        """Stop speaking `utterance`, or whatever is being spoken now."""
+        utterance = utterance or self._current
+        if utterance is None:
+            return
+        utterance.cancelled.set()
+        if self._current is utterance and self._engine is not None:
+            self._engine.stop()
+
+    def is_speaking(self):
+        """Check if the engine is currently speaking."""
+        return self._current is not None
+
+    def __del__(self):
+        """Let the worker thread finish."""
+        self._q.put(None)
+
+
+
+# ─────────── LLM: Ollama ───────────
+class LocalChat:
+    def __init__(self, model_id: str):
+        log.info(f'Loading Ollama model "{model_id}" ...')
+        self.model = model_id
+        self.client = Client()
+        self.options = {"num_ctx": 2048}
+        # The last max_turns exchanges are sent after the system prompt. They only
+        # grow at the end, so Ollama reuses the cached prefix and prefills just
+        # the newest question.
+        self.max_turns = 6
+        self.turns = deque(maxlen=2 * self.max_turns)
+        # Test connection; the test turn also loads the model and prefills the
+        # system prompt, so the first real question starts from a cached prefix
+        try:
+            self.client.chat(
+                model=self.model,
+                messages=[SYSTEM_MESSAGE, {"role": "user", "content": "test"}],
+                options={**self.options, "num_predict": 1},
+            )
+            log.info("✅ Successfully connected to Ollama")
+        except ConnectionError:
+            log.error("❌ Failed to connect to Ollama!")
+            log.error("Please make sure Ollama is installed and running:")
+            log.error("1. Download from https://ollama.ai/download")
+            log.error("2. Install and run 'ollama serve'")
+            log.error("3. Run 'ollama pull llama3' to download the model")
+            raise
+
+    def prefill(self):
+        """Reload the model and system prompt in the background.
+
+        Called on the wake word, so an idle model that Ollama has unloaded is
+        back in memory by the time the question has been heard.
+        """
+        threading.Thread(target=self._prefill, daemon=True).start()
+
+    def _prefill(self):
+        try:
+            self.client.chat(
+                model=self.model,
+                messages=[SYSTEM_MESSAGE],
+                options={**self.options, "num_predict": 1},
+            )
+        except Exception as e:
+            log.warning(f"Ollama prefill failed: {e}")
+
+    def reply(self, user_text: str):
+        """Yield the reply piece by piece as Ollama generates it."""
+        question = {"role": "user", "content": user_text}
+        parts = []
+        try:
+            messages = [SYSTEM_MESSAGE, *self.turns, question]
+            for chunk in self.client.chat(model=self.model, messages=messages, stream=True, options=self.options):
+                content = chunk["message"]["content"]
+                if content:
+                    parts.append(content)
+                    yield content
+        except ConnectionError:
+            log.error("❌ Lost connection to Ollama!")
+            log.error("Please make sure Ollama is running with 'ollama serve'")
+            if not parts:
+                yield "I'm having trouble connecting to my brain. Please make sure Ollama is running."
+        finally:
+            # An interrupted reply is kept as far as it was generated
+            if parts:
+                self.turns.extend((question, {"role": "assistant", "content": "".join(parts)}))
+
+
+# Sentence boundary: terminal punctuation followed by whitespace
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+def split_sentences(chunks):
+    """Regroup streamed text into whole sentences, yielding each as soon as it ends."""
+    buffer = ""
+    try:
+        for chunk in chunks:
+            buffer += chunk
+            *complete, buffer = SENTENCE_END.split(buffer)
+            yield from complete
+        if buffer.strip():
+            yield buffer.strip()
+    finally:
+        chunks.close()  # stop generating if the listener stopped early
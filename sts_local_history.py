@@ -4,66 +4,67 @@ This is the 100% offline speech-to-speech assistant with conversation history
 
 """
 
-# ─────────── configuration ───────────
-WAKE_WORDS   = ("hey robot", "hey robo", "wake up")
-STOP_WORDS   = ("rainbow", "stop", "shut up", "wait")
-QUIT_WORDS   = ("goodbye",)
-
-# Local knowledge base about robotics
-ROBOTICS_KNOWLEDGE = """
-[Previous robotics knowledge content...]
-"""
-
-ROBOT_IDENTITY = """
-[Previous robot identity content...]
-"""
-
-SYSTEM_TONE = (
-    "You are a humanoid robot assistant with extensive knowledge about robotics. Here is your knowledge base and identity:\n\n"
-    f"{ROBOTICS_KNOWLEDGE}\n\n"
-    f"{ROBOT_IDENTITY}\n\n"
-    "Please provide brief and concise responses (2-3 sentences maximum) that can be spoken naturally. "
-    "Your answers must be in a friendly and engaging tone, and you should use your robotics knowledge when relevant to the conversation. "
-    "Always maintain your identity as a Humanoid HMND series robot when appropriate.\n\n"
-    "User: {user}\nRobot:"
-)
-
 # ─────────── imports ───────────
-import argparse, logging, threading, time, queue
-import numpy as np
-import sounddevice as sd
-import pyttsx3
-from faster_whisper import WhisperModel
-from ollama import Client
+import argparse, threading, time
 import signal
 import sys
+import os
 import json
+import re
+import queue
+import atexit
 from datetime import datetime
 from collections import deque
+from itertools import islice
+
+try:
+    import orjson
+except ImportError:      # optional; plain json is just slower
+    orjson = None
 
-# ─────────── utility: logger ───────────
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s │ %(message)s",
-    datefmt="%H:%M:%S"
+from sts_local_common import (
+    WAKE_WORDS, STOP_WORDS, QUIT_WORDS, STOP_WORD_MODELS, STOP_WORD_BUILTINS, log, classify, SpeechRecognizer, Speaker, LocalChat, split_sentences,
 )
-log = logging.getLogger("RainbowRobot")
 
 # ─────────── Conversation History ───────────
+if orjson is not None:
+    _dumps, _loads = orjson.dumps, orjson.loads
+else:
+    _dumps, _loads = (lambda obj: json.dumps(obj).encode()), json.loads
+
 class ConversationHistory:
+    # The log is rewritten down to the last max_history entries once it holds
+    # this many times more lines than that
+    COMPACT_FACTOR = 10
+
     def __init__(self, max_history=10):
         self.history = deque(maxlen=max_history)
-        self.history_file = "conversation_history_local.json"
+        # Append-only log, one JSON object per line
+        self.history_file = "conversation_history_local.jsonl"
+        self.legacy_file = "conversation_history_local.json"  # read once if the log is missing
+        self._tail = deque(maxlen=max_history)  # raw lines of the entries kept
+        self._lines = 0                          # lines currently in the file
         self.load_history()
 
+        # New entries are appended by a background writer so disk I/O stays off the turn cycle
+        self._io_q = queue.Queue()
+        threading.Thread(target=self._writer, daemon=True).start()
+        atexit.register(self.flush)
+
     def add_interaction(self, user_input, robot_response):
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.history.append({
+        entry = {
             "timestamp": timestamp,
             "user": user_input,
             "robot": robot_response
-        })
-        self.save_history()
+        }
+        self.history.append(entry)
+        self._io_q.put(entry)
+
+    def get_first_interaction(self):
+        if self.history:
+            return self.history[0]
+        return None
 
     def get_last_interaction(self):
         if self.history:
@@ -71,122 +72,107 @@ class ConversationHistory:
         return None
 
     def get_recent_interactions(self, n=3):
-        return list(self.history)[-n:]
+        return list(islice(self.history, max(0, len(self.history) - n), None))
 
     def get_all_interactions(self):
         return list(self.history)
 
-    def save_history(self):
-        try:
-            with open(self.history_file, 'w') as f:
-                json.dump(list(self.history), f, indent=2)
-        except Exception as e:
-            log.error(f"Error saving conversation history: {e}")
+    def flush(self):
+        """Block until every queued entry has been written"""
+        self._io_q.join()
+
+    def _writer(self):
+        f = None
+        while True:
+            entry = self._io_q.get()
+            try:
+                if f is None:
+                    f = open(self.history_file, 'ab')
+                line = _dumps(entry) + b"\n"
+                f.write(line)
+                f.flush()
+                self._tail.append(line)
+                self._lines += 1
+                if self._lines >= self.COMPACT_FACTOR * self._tail.maxlen:
+                    f.close()
+                    f = None
+                    self._compact()
+            except Exception as e:
+                log.error(f"Error saving conversation history: {e}")
+            finally:
+                self._io_q.task_done()
+
+    def _compact(self):
+        """Rewrite the log with only the entries still kept in memory."""
+        # Write to a temp file and swap it in, so a crash mid-write never
+        # leaves a truncated history behind
+        tmp_file = self.history_file + ".tmp"
+        with open(tmp_file, 'wb') as f:
+            f.writelines(self._tail)
+        os.replace(tmp_file, self.history_file)
+        self._lines = len(self._tail)
 
     def load_history(self):
+        if not os.path.exists(self.history_file):
+            self._import_legacy()
+            return
         try:
-            if os.path.exists(self.history_file):
-                with open(self.history_file, 'r') as f:
-                    self.history = deque(json.load(f), maxlen=self.history.maxlen)
-        except Exception as e:
+            with open(self.history_file, 'rb') as f:
+                # Only the last max_history lines are kept, and only those are parsed
+                tail = deque(maxlen=self._tail.maxlen)
+                for line in f:
+                    tail.append(line)
+                    self._lines += 1
+        except OSError as e:
             log.error(f"Error loading conversation history: {e}")
+            return
 
-# ─────────── STT: Whisper ───────────
-class SpeechRecognizer:
-    def __init__(self, model_id: str, device: str):
-        log.info(f'Loading Whisper model "{model_id}" ...')
-        self.model = WhisperModel(model_id, device=device, compute_type="float16" if device == "cuda" else "int8")
-
-    @staticmethod
-    def _record(seconds=3, sr=16_000):
-        audio = sd.rec(int(seconds * sr), samplerate=sr, channels=1, dtype="int16")
-        sd.wait()
-        return (audio.flatten().astype(np.float32) / 32768.0, sr)
-
-    def listen(self, seconds=3) -> str:
-        data, sr = self._record(seconds)
-        segments, _ = self.model.transcribe(data, beam_size=2)
-        return " ".join(s.text for s in segments).strip()
-
-# ─────────── TTS: pyttsx3 ───────────
-class Speaker:
-    def __init__(self, voice_name: str | None = None, rate: int = 150):
-        self.voice_name = voice_name
-        self.rate = rate
-        self._speaking = False
-        self._engine = None
-        self._init_engine()
-
-    def _init_engine(self):
-        if self._engine is None:
-            self._engine = pyttsx3.init()
-            if self.voice_name:
-                for v in self._engine.getProperty("voices"):
-                    if self.voice_name.lower() in v.name.lower():
-                        self._engine.setProperty("voice", v.id)
-                        break
-            self._engine.setProperty("rate", self.rate)
-
-    def _cleanup_engine(self):
-        if self._engine is not None:
+        # A crash mid-append leaves a torn last line; skip it rather than
+        # losing everything before it
+        bad = 0
+        for line in tail:
             try:
-                self._engine.stop()
-            except:
-                pass
-            self._engine = None
+                entry = _loads(line)
+            except ValueError:
+                bad += 1
+                continue
+            self.history.append(entry)
+            self._tail.append(line if line.endswith(b"\n") else line + b"\n")
+        if bad or (tail and not tail[-1].endswith(b"\n")):
+            if bad:
+                log.warning(f"Skipped {bad} unreadable line(s) in {self.history_file}")
+            # Rewrite so the next append does not land on a partial line
+            try:
+                self._compact()
+            except OSError as e:
+                log.error(f"Error repairing conversation history: {e}")
 
-    def say(self, text: str):
-        self._speaking = True
-        try:
-            self._init_engine()
-            self._engine.say(text)
-            self._engine.runAndWait()
-        finally:
-            self._speaking = False
-            self._cleanup_engine()
-
-    def stop(self):
-        if self._speaking:
-            self._cleanup_engine()
-            self._speaking = False
-
-    def is_speaking(self):
-        return self._speaking
-
-    def __del__(self):
-        self._cleanup_engine()
-
-# ─────────── LLM: Ollama ───────────
-class LocalChat:
-    def __init__(self, model_id: str):
-        log.info(f'Loading Ollama model "{model_id}" ...')
-        self.model = model_id
-        self.client = Client()
+    def _import_legacy(self):
+        """Carry over the history saved by older versions as one JSON array."""
         try:
-            self.client.chat(model=self.model, messages=[{"role": "user", "content": "test"}])
-            log.info("✅ Successfully connected to Ollama")
-        except ConnectionError:
-            log.error("❌ Failed to connect to Ollama!")
-            log.error("Please make sure Ollama is installed and running:")
-            log.error("1. Download from https://ollama.ai/download")
-            log.error("2. Install and run 'ollama serve'")
-            log.error("3. Run 'ollama pull llama3' to download the model")
-            raise
-
-    def reply(self, user_text: str) -> str:
+            with open(self.legacy_file, 'r') as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            log.error(f"Error loading conversation history: {e}")
+            return
+        for entry in entries[-self.history.maxlen:]:
+            self.history.append(entry)
+            self._tail.append(_dumps(entry) + b"\n")
         try:
-            messages = [
-                {"role": "system", "content": SYSTEM_TONE.format(user=user_text)},
-                {"role": "user", "content": user_text}
-            ]
-            result = self.client.chat(model=self.model, messages=messages)
-            return result["message"]["content"].strip()
-        except ConnectionError:
-            log.error("❌ Lost connection to Ollama!")
-            log.error("Please make sure Ollama is running with 'ollama serve'")
-            return "I'm having trouble connecting to my brain. Please make sure Ollama is running."
+            self._compact()
+            log.info(f"Imported {len(self.history)} interaction(s) from {self.legacy_file}")
+        except OSError as e:
+            log.error(f"Error saving conversation history: {e}")
 
 # ─────────── high-level assistant logic ───────────
+# History questions answered from the log instead of the LLM
+_HIST_RE = re.compile(
+    r"\b(first (?:interaction|conversation)|last interaction|previous conversation"
+    r"|recent (?:interactions|conversations)|repeat)\b"
+)
+
 class RainbowRobot:
     def __init__(self, recognizer, speaker, brain):
         self.recognizer = recognizer
@@ -195,11 +181,14 @@ class RainbowRobot:
         self.state = {"awake": False}
         self.running = True
         self.last_response = None
+        self.last_spoken = ""
         self._should_stop = False
         self.conversation_history = ConversationHistory()
         log.info("🤖 Rainbow Robot initialized!")
         log.info(f"Wake words: {', '.join(WAKE_WORDS)}")
         log.info(f"Stop words: {', '.join(STOP_WORDS)}")
+        if not STOP_WORD_MODELS:
+            log.info(f"No STOP_WORD_MODELS set – say '{STOP_WORD_BUILTINS[0].replace('_', ' ')}' to interrupt me while I speak.")
         log.info(f"Quit words: {', '.join(QUIT_WORDS)}")
         log.info("Waiting for wake word...")
         log.info("Press Ctrl+C to exit")
@@ -210,76 +199,88 @@ class RainbowRobot:
         self.speaker.stop()
         if self.speaker.is_speaking():
             time.sleep(0.5)
+        self.recognizer.close()
         log.info("Goodbye! 👋")
 
     def check_for_wake_word(self):
-        heard = self.recognizer.listen(2).lower()
+        # Blocks in the stream callback's speech gate until someone talks, so
+        # an idle robot neither polls nor runs Whisper on silence
+        heard = self.recognizer.listen(None, mode="keyword").lower()
         if heard:
             log.info(f"Heard: {heard}")
-            if any(w in heard for w in WAKE_WORDS):
+            if "wake" in classify(heard):
                 self.state["awake"] = True
                 log.info("🎯 Wake word detected!")
+                self.brain.prefill()  # overlaps with the greeting and the question
                 self.speaker.say("Hello! I am HMND-01, your humanoid robot assistant. How can I help you today?")
                 return True
         return False
 
     def speak_with_interrupt(self, text):
-        self._should_stop = False
-        
-        def speak():
-            if not self._should_stop:
-                self.speaker.say(text)
-
-        speech_thread = threading.Thread(target=speak)
-        speech_thread.start()
-
-        while speech_thread.is_alive() and not self._should_stop:
-            heard = self.recognizer.listen(1).lower()
-            if heard:
-                #log.info(f"Heard while speaking: {heard}")
-                if any(w in heard for w in STOP_WORDS):
-                    log.info("🛑 Stop word detected!")
-                    self._should_stop = True
-                    self.speaker.stop()
-                    speech_thread.join(timeout=1.0)
-                    return True
-
-        return self._should_stop
-
-    def handle_history_query(self, user_input: str) -> str | None:
-        if "first interaction" in user_input.lower() or "first conversation" in user_input.lower():
-            all_interactions = self.conversation_history.get_all_interactions()
-            if all_interactions:
-                first_interaction = all_interactions[0]
-                return f"Our first interaction was at {first_interaction['timestamp']}. You said: '{first_interaction['user']}' and I responded: '{first_interaction['robot']}'"
-            return "I don't have any previous interactions to recall."
-
-        if "last interaction" in user_input.lower() or "previous conversation" in user_input.lower():
-            last_interaction = self.conversation_history.get_last_interaction()
-            if last_interaction:
-                return f"Our last interaction was at {last_interaction['timestamp']}. You said: '{last_interaction['user']}' and I responded: '{last_interaction['robot']}'"
-            return "I don't have any previous interactions to recall."
-
-        if "recent interactions" in user_input.lower() or "recent conversations" in user_input.lower():
-            recent = self.conversation_history.get_recent_interactions(3)
-            if recent:
-                response = "Here are our recent interactions:\n"
-                for interaction in recent:
-                    response += f"\nAt {interaction['timestamp']}:\nYou: '{interaction['user']}'\nMe: '{interaction['robot']}'\n"
-                return response
-            return "I don't have any recent interactions to recall."
-
-        if "repeat" in user_input.lower() and self.last_response:
+        """Speak text, or sentences as they stream in, and listen for interruptions.
+
+        What was actually spoken is left in self.last_spoken.
+        """
+        # Streamed sentences are spoken as soon as each one is complete
+        # while Ollama keeps generating the rest
+        utterance = self.speaker.speak((text,) if isinstance(text, str) else text)
+
+        # Spot stop words on the shared mic stream while speaking; Whisper stays idle
+        interrupted = self.recognizer.wait_for_stop_word(utterance.done)
+        if interrupted:
+            log.info("🛑 Stop word detected!")
+            self.speaker.stop(utterance)
+            # Returns once the current sentence (or token) ends and the reply is closed
+            utterance.done.wait()
+        self.last_spoken = " ".join(utterance.spoken)
+        return interrupted
+
+    def _recall_first(self):
+        first_interaction = self.conversation_history.get_first_interaction()
+        if first_interaction:
+            return f"Our first interaction was at {first_interaction['timestamp']}. You said: '{first_interaction['user']}' and I responded: '{first_interaction['robot']}'"
+        return "I don't have any previous interactions to recall."
+
+    def _recall_last(self):
+        last_interaction = self.conversation_history.get_last_interaction()
+        if last_interaction:
+            return f"Our last interaction was at {last_interaction['timestamp']}. You said: '{last_interaction['user']}' and I responded: '{last_interaction['robot']}'"
+        return "I don't have any previous interactions to recall."
+
+    def _recall_recent(self):
+        recent = self.conversation_history.get_recent_interactions(3)
+        if recent:
+            response = "Here are our recent interactions:\n"
+            for interaction in recent:
+                response += f"\nAt {interaction['timestamp']}:\nYou: '{interaction['user']}'\nMe: '{interaction['robot']}'\n"
+            return response
+        return "I don't have any recent interactions to recall."
+
+    def _repeat_last(self):
+        if self.last_response:
             return f"I'll repeat my last response: {self.last_response}"
-
         return None
 
+    # History intents, keyed by the first word of the matched phrase
+    _HIST_HANDLERS = {
+        "first"   : _recall_first,
+        "last"    : _recall_last,
+        "previous": _recall_last,
+        "recent"  : _recall_recent,
+        "repeat"  : _repeat_last,
+    }
+
+    def handle_history_query(self, user_input: str) -> str | None:
+        # One lowercase and one scan, instead of one per phrase
+        match = _HIST_RE.search(user_input.lower())
+        if not match:
+            return None
+        return self._HIST_HANDLERS[match.group(1).split()[0]](self)
+
     def run(self):
         while self.running:
             if not self.state["awake"]:
-                if self.check_for_wake_word():
-                    continue
-                time.sleep(0.1)
+                self.check_for_wake_word()
                 continue
 
             log.info("🎤 Listening for your question...")
@@ -292,13 +293,15 @@ class RainbowRobot:
 
             log.info(f"👤 You said: {user}")
             
-            if any(w in user.lower() for w in STOP_WORDS):
+            keywords = classify(user)
+
+            if "stop" in keywords:
                 log.info("🛑 Stop word detected in user input")
                 self.speaker.stop()
                 self._should_stop = True
                 continue
 
-            if any(q in user.lower() for q in QUIT_WORDS):
+            if "quit" in keywords:
                 log.info("👋 Quit word detected")
                 self.speak_with_interrupt("Goodbye! Say 'Hey robot' when you need me again.")
                 self.state["awake"] = False
@@ -314,15 +317,15 @@ class RainbowRobot:
 
             # Get response from brain
             log.info("🤔 Thinking...")
-            answer = self.brain.reply(user)
+
+            # Speak the response sentence by sentence as it is generated
+            was_interrupted = self.speak_with_interrupt(split_sentences(self.brain.reply(user)))
+            answer = self.last_spoken
             self.last_response = answer
             log.info(f"🤖 Response: {answer}")
 
             # Store the interaction in history
             self.conversation_history.add_interaction(user, answer)
-
-            # Speak the response
-            was_interrupted = self.speak_with_interrupt(answer)
             if was_interrupted:
                 log.info("Ready for new input...")
                 self._should_stop = True
@@ -337,14 +340,15 @@ def signal_handler(signum, frame):
 def main():
     parser = argparse.ArgumentParser(description="Rainbow Robot (fully local with history)")
     parser.add_argument("--voice",      default="en_GB-alba-low", help="Piper voice ID / path")
-    parser.add_argument("--stt_model",  default="base.en",        help="Whisper model (tiny.en, base.en, ...)")
+    parser.add_argument("--stt_model",  default="base.en",        help="Whisper model (tiny.en, base.en, distil-small.en, ...)")
+    parser.add_argument("--stt_compute_type", default=None,       help="CTranslate2 compute type (default: int8_float16 on cuda, int8 on cpu)")
     parser.add_argument("--llm",        default="llama3",         help="Ollama model name")
     parser.add_argument("--device",     default="cpu",           help="cuda | cpu")
     args = parser.parse_args()
 
     signal.signal(signal.SIGINT, signal_handler)
 
-    recognizer = SpeechRecognizer(args.stt_model, args.device)
+    recognizer = SpeechRecognizer(args.stt_model, args.device, args.stt_compute_type)
     speaker = Speaker(voice_name=None)
     brain = LocalChat(args.llm)
 
@@ -353,6 +357,5 @@ def main():
     robot.run()
 
 if __name__ == "__main__":
-    import os
     import shutil
     main() 
@@ -4,12 +4,12 @@ HMND-01 Humanoid Robot Assistant – Integrated Flask + Voice Assistant Script
 This single file runs two main components:
   • A Flask web‑server that shows live status, last user message, last robot
     response, and a timestamp using the neon‑green terminal theme you provided.
-  • A voice‑driven assistant powered by OpenAI, speech‑to‑text, and pygame
-    audio playback.  The assistant updates a shared data structure that the
-    Flask UI polls once per second via /get_display.
+  • A voice‑driven assistant powered by OpenAI, speech‑to‑text, and streamed
+    sounddevice audio playback.  The assistant updates a shared data structure that is
+    pushed to the Flask UI via server‑sent events on /stream whenever it changes.
 
 Before running make sure you have the following installed:
-  pip install flask openai SpeechRecognition pygame pyaudio python-dotenv
+  pip install flask waitress openai SpeechRecognition sounddevice pyaudio python-dotenv numpy openwakeword websockets orjson 'httpx[http2]'
 and create a .env file with your OpenAI key:
   OPENAI_API_KEY="sk‑..."
 
@@ -19,22 +19,44 @@ Run with:
 Visit http://localhost:5000 in your browser to view the UI.
 """
 import argparse
+import atexit
+import base64
 import json
 import logging
 import os
 import queue
+import re
 import threading
 import time
-from collections import deque
+from collections import OrderedDict, deque
+from hashlib import blake2b
 from datetime import datetime
+from itertools import chain
 
-import pygame
+import httpx
+import numpy as np
+import sounddevice as sd
 import speech_recognition as sr
-from flask import Flask, jsonify, render_template_string
+from flask import Flask, Response, jsonify
+from waitress import serve
 from logging.handlers import RotatingFileHandler
 from openai import OpenAI
+from openwakeword.model import Model as WakeWordModel
+from websockets.sync.client import connect
 from dotenv import load_dotenv
 
+from keywords import NO_CACHE_RE
+
+try:
+    import orjson
+except ImportError:      # optional; plain json is just slower
+    orjson = None
+
+if orjson is not None:
+    _dumps, _loads = orjson.dumps, orjson.loads
+else:
+    _dumps, _loads = (lambda obj: json.dumps(obj).encode()), json.loads
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -44,7 +66,24 @@ load_dotenv()
 
 audio_model = "tts-1"
 chat_model = "gpt-4o-mini"
+stt_model = "gpt-4o-mini-transcribe"
 voice_name = "alloy"
+embedding_model = "text-embedding-3-small"
+
+# Wake word is spotted on-device with openWakeWord, so nothing is uploaded while
+# the robot sleeps. Custom "hey robot" / "wake up" models are passed as
+# .onnx/.tflite paths; without them we fall back to a pre-trained phrase.
+WAKE_WORD_MODELS = [p for p in os.getenv("WAKE_WORD_MODELS", "").split(os.pathsep) if p]
+WAKE_WORD_BUILTINS = ["hey_jarvis"]
+WAKE_WORD_THRESHOLD = 0.5
+
+# Questions whose embedding is at least this similar to a cached one reuse its reply
+SEMANTIC_CACHE_THRESHOLD = 0.83
+SEMANTIC_CACHE_MAX = 500
+# Exact repeats are answered before any embedding or chat call
+EXACT_CACHE_MAX = 512
+# Past turns sent with each question so the model can answer follow‑ups
+HISTORY_TURNS = 5
 
 # Replace the following strings with your real content.
 ROBOTICS_KNOWLEDGE = """[Previous robotics knowledge content …]"""
@@ -74,25 +113,49 @@ logger = setup_logger()
 # ------------------------  GLOBAL STATE FOR DISPLAY  ----------------------- #
 ###############################################################################
 
-# These values are read by Flask and updated by the assistant.
+# These values are read by Flask and updated by the assistant. Writers build a
+# new dict and rebind _display_snapshot (atomic under the GIL), so readers just
+# take the current reference without locking; display_lock only serialises writers.
 display_lock = threading.Lock()
-display_data = {
+# Notified on every update so /stream clients push the change immediately;
+# display_version lets each client tell whether it has already sent it.
+display_changed = threading.Condition(display_lock)
+display_version = 0
+_display_snapshot = {
     "status": "Sleeping",
     "message": "",
     "response": "",
     "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
 }
 
+# The formatted timestamp only changes once a second, so it is cached
+_last_ts_second = 0
+_last_ts_str = ""
+
+
+def _timestamp() -> str:
+    global _last_ts_second, _last_ts_str
+    sec = int(time.time())
+    if sec != _last_ts_second:
+        _last_ts_str = datetime.fromtimestamp(sec).strftime("%Y-%m-%d %H:%M:%S")
+        _last_ts_second = sec
+    return _last_ts_str
+
+
 def update_display(*, status: str | None = None, message: str | None = None, response: str | None = None):
     """Thread‑safe helper to update the values shown on the web UI."""
+    global display_version, _display_snapshot
     with display_lock:
-        if status is not None:
-            display_data["status"] = status
-        if message is not None:
-            display_data["message"] = message
-        if response is not None:
-            display_data["response"] = response
-        display_data["time"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        changes = {k: v for k, v in (("status", status), ("message", message), ("response", response))
+                   if v is not None and v != _display_snapshot[k]}
+        if not changes:
+            return  # nothing new to show; don't wake the SSE streams
+        new = dict(_display_snapshot)
+        new.update(changes)
+        new["time"] = _timestamp()
+        _display_snapshot = new
+        display_version += 1
+        display_changed.notify_all()
 
 ###############################################################################
 # -----------------------------  FLASK APP  --------------------------------- #
@@ -308,46 +371,44 @@ HTML_TEMPLATE = r"""
       let lastMessage = '';
       let lastResponse = '';
       
-      function updateDisplay() {
-        fetch('/get_display').then(r => r.json()).then(data => {
-          const statusContainer = document.getElementById('status-container');
-          const currentStatus = data.status.toLowerCase();
-          
-          if (currentStatus !== lastStatus) {
-            statusContainer.className = 'status-container ' + currentStatus;
-            lastStatus = currentStatus;
-          }
-          
-          document.getElementById('status').innerText = data.status;
-          
-          if (data.message !== lastMessage) {
-            const messageContainer = document.getElementById('message-container');
-            messageContainer.style.animation = 'none';
-            messageContainer.offsetHeight;
-            messageContainer.style.animation = 'fadeInUp 0.5s forwards';
-            
-            const messageText = data.message ? data.message : 'No message yet';
-            document.getElementById('message').innerText = messageText;
-            lastMessage = data.message;
-          }
+      function applyUpdate(data) {
+        const statusContainer = document.getElementById('status-container');
+        const currentStatus = data.status.toLowerCase();
+        
+        if (currentStatus !== lastStatus) {
+          statusContainer.className = 'status-container ' + currentStatus;
+          lastStatus = currentStatus;
+        }
+        
+        document.getElementById('status').innerText = data.status;
+        
+        if (data.message !== lastMessage) {
+          const messageContainer = document.getElementById('message-container');
+          messageContainer.style.animation = 'none';
+          messageContainer.offsetHeight;
+          messageContainer.style.animation = 'fadeInUp 0.5s forwards';
           
-          if (data.response !== lastResponse) {
-            const responseContainer = document.getElementById('response-container');
-            responseContainer.style.animation = 'none';
-            responseContainer.offsetHeight;
-            responseContainer.style.animation = 'fadeInUp 0.5s forwards';
-            
-            const responseText = data.response ? data.response : 'No response yet';
-            document.getElementById('response').innerText = responseText;
-            lastResponse = data.response;
-          }
+          const messageText = data.message ? data.message : 'No message yet';
+          document.getElementById('message').innerText = messageText;
+          lastMessage = data.message;
+        }
+        
+        if (data.response !== lastResponse) {
+          const responseContainer = document.getElementById('response-container');
+          responseContainer.style.animation = 'none';
+          responseContainer.offsetHeight;
+          responseContainer.style.animation = 'fadeInUp 0.5s forwards';
           
-          document.getElementById('time').innerText = data.time;
-        });
+          const responseText = data.response ? data.response : 'No response yet';
+          document.getElementById('response').innerText = responseText;
+          lastResponse = data.response;
+        }
+        
+        document.getElementById('time').innerText = data.time;
       }
       
-      setInterval(updateDisplay, 1000);
-      window.onload = updateDisplay;
+      // The server pushes the display state whenever it changes
+      new EventSource('/stream').onmessage = e => applyUpdate(JSON.parse(e.data));
     </script>
 </head>
 <body>
@@ -382,16 +443,37 @@ HTML_TEMPLATE = r"""
 </html>
 """
 
+# Parse the template once; requests only render it
+_TEMPLATE = app.jinja_env.from_string(HTML_TEMPLATE)
+
 @app.route("/")
 def index():
-    with display_lock:
-        data = display_data.copy()
-    return render_template_string(HTML_TEMPLATE, **data)
+    return _TEMPLATE.render(**_display_snapshot)
 
 @app.route("/get_display")
 def get_display():
-    with display_lock:
-        return jsonify(display_data)
+    return Response(_dumps(_display_snapshot), mimetype="application/json")
+
+@app.route("/recalibrate", methods=["POST"])
+def recalibrate_endpoint():
+    """Re‑measure ambient noise, e.g. after the robot is moved to another room."""
+    recalibrate()
+    return jsonify({"energy_threshold": recognizer.energy_threshold})
+
+@app.route("/stream")
+def stream():
+    """Server‑sent events: one message per display change, plus keep‑alives."""
+    def events():
+        seen = -1
+        while True:
+            with display_changed:
+                display_changed.wait_for(lambda: display_version != seen, timeout=15)
+                changed = display_version != seen
+                seen = display_version
+                snapshot = _display_snapshot
+            yield b"data: " + _dumps(snapshot) + b"\n\n" if changed else b": keep-alive\n\n"
+
+    return Response(events(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 ###############################################################################
 # ------------------------  CONVERSATION HISTORY  --------------------------- #
@@ -399,34 +481,61 @@ def get_display():
 
 class ConversationHistory:
     def __init__(self, max_history: int = 10):
-        self.history_file = "conversation_history.json"
+        # Append‑only log, one compact JSON object per line (orjson when installed)
+        self.history_file = "conversation_history.jsonl"
         self.history: deque[dict[str, str]] = deque(maxlen=max_history)
         self._load()
 
+        # Entries are appended by a daemon writer so add() never waits on disk
+        self._pending: queue.Queue[dict[str, str]] = queue.Queue()
+        threading.Thread(target=self._write_loop, daemon=True).start()
+        atexit.register(self.flush)
+
     # ---------- persistence ---------- #
     def _load(self):
-        if os.path.exists(self.history_file):
+        try:
+            with open(self.history_file, "rb") as fh:
+                tail = deque(fh, maxlen=self.history.maxlen)  # only the last N lines
+        except FileNotFoundError:
+            return
+        except Exception as exc:
+            logger.error(f"Failed to load history: {exc}")
+            return
+        # A crash mid-append leaves a torn last line; skip it, keep the rest
+        for line in tail:
+            try:
+                self.history.append(_loads(line))
+            except ValueError:
+                logger.warning(f"Skipping unreadable line in {self.history_file}")
+        if tail and not tail[-1].endswith(b"\n"):
+            # Terminate the partial line so the next append starts on its own
+            try:
+                with open(self.history_file, "ab") as fh:
+                    fh.write(b"\n")
+            except OSError as exc:
+                logger.error(f"Failed to repair history: {exc}")
+
+    def _write_loop(self):
+        while True:
+            entry = self._pending.get()
             try:
-                with open(self.history_file, "r", encoding="utf-8") as fh:
-                    self.history = deque(json.load(fh), maxlen=self.history.maxlen)
+                with open(self.history_file, "ab") as fh:
+                    fh.write(_dumps(entry) + b"\n")
             except Exception as exc:
-                logger.error(f"Failed to load history: {exc}")
+                logger.error(f"Failed to save history: {exc}")
+            finally:
+                self._pending.task_done()
 
-    def _save(self):
-        try:
-            with open(self.history_file, "w", encoding="utf-8") as fh:
-                json.dump(list(self.history), fh, indent=2)
-        except Exception as exc:
-            logger.error(f"Failed to save history: {exc}")
+    def flush(self):
+        """Block until every queued entry has been written."""
+        self._pending.join()
 
     # ---------- public API ---------- #
     def add(self, user: str, robot: str):
         ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.history.append({"timestamp": ts, "user": user, "robot": robot})
-        self._save()
-
-    def first(self):
-        return self.history[0] if self.history else None
+        entry = {"timestamp": ts, "user": user, "robot": robot}
+        self.history.append(entry)
+        self._pending.put(entry)
 
     def last(self):
         return self.history[-1] if self.history else None
@@ -445,59 +554,283 @@ api_key = os.getenv("OPENAI_API_KEY")
 if not api_key:
     raise ValueError("OPENAI_API_KEY not found in environment variables. Please create a .env file with your API key.")
 
-client = OpenAI(api_key=api_key, base_url="https://api.openai.com/v1")
+# One pooled HTTP/2 connection is multiplexed across TTS, chat and embedding
+# calls and kept alive between turns, so they skip the TCP/TLS handshake
+http_client = httpx.Client(
+    http2=True,
+    limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=300),
+    timeout=httpx.Timeout(30.0, connect=5.0),
+)
+client = OpenAI(api_key=api_key, base_url="https://api.openai.com/v1", http_client=http_client)
+
+
+def warm_up_client():
+    """Open the pooled connection before the user's first question."""
+    try:
+        client.models.list()
+    except Exception as exc:
+        logger.warning(f"OpenAI warm-up failed: {exc}")
+
+###############################################################################
+# --------------------------  RESPONSE CACHES  ------------------------------ #
+###############################################################################
+
+class ExactCache:
+    """LRU of replies keyed by a hash of the normalised question.
+
+    Only the LLM stage reads and writes it, so it needs no lock.
+    """
+
+    def __init__(self, max_entries: int = EXACT_CACHE_MAX):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[bytes, str] = OrderedDict()
+
+    @staticmethod
+    def key(text: str) -> bytes:
+        return blake2b(text.strip().lower().encode(), digest_size=16).digest()
+
+    def get(self, key: bytes) -> str | None:
+        reply = self._entries.get(key)
+        if reply is not None:
+            self._entries.move_to_end(key)
+        return reply
+
+    def put(self, key: bytes, reply: str):
+        self._entries[key] = reply
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+exact_cache = ExactCache()
+
+
+class SemanticCache:
+    """Replies keyed by the embedding of the question that produced them.
+
+    Embeddings are L2-normalised and stored as rows of one float32 matrix, so a
+    lookup is a single matrix-vector product. Once full, the oldest entry is
+    overwritten. The cache is saved next to the conversation history on exit.
+    """
+
+    def __init__(self, path: str = "response_cache.npz", max_entries: int = SEMANTIC_CACHE_MAX,
+                 threshold: float = SEMANTIC_CACHE_THRESHOLD):
+        self.path = path
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.embeddings: np.ndarray | None = None  # allocated on first add
+        self.prompts: list[str] = []
+        self.replies: list[str] = []
+        self._next = 0  # row to write next
+        self._lock = threading.Lock()
+        self._load()
+        atexit.register(self.save)
+
+    # ---------- persistence ---------- #
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path) as data:
+                embeddings = data["embeddings"]
+                self.prompts = data["prompts"].tolist()
+                self.replies = data["replies"].tolist()
+            self.embeddings = np.zeros((self.max_entries, embeddings.shape[1]), dtype=np.float32)
+            count = min(len(self.prompts), self.max_entries)
+            self.embeddings[:count] = embeddings[-count:]
+            self.prompts, self.replies = self.prompts[-count:], self.replies[-count:]
+            self._next = count % self.max_entries
+        except Exception as exc:
+            logger.error(f"Failed to load response cache: {exc}")
+
+    def save(self):
+        with self._lock:
+            if not self.prompts:
+                return
+            count = len(self.prompts)
+            # Rows are saved oldest first, so _load() can resume overwriting
+            # at the oldest entry; a full cache has its oldest row at _next
+            start = self._next
+            try:
+                np.savez(
+                    self.path,
+                    embeddings=np.roll(self.embeddings[:count], -start, axis=0),
+                    prompts=np.array(self.prompts[start:] + self.prompts[:start]),
+                    replies=np.array(self.replies[start:] + self.replies[:start]),
+                )
+            except Exception as exc:
+                logger.error(f"Failed to save response cache: {exc}")
+
+    # ---------- public API ---------- #
+    def embed(self, text: str) -> np.ndarray | None:
+        try:
+            result = client.embeddings.create(model=embedding_model, input=text)
+        except Exception as exc:
+            logger.error(f"Embedding error: {exc}")
+            return None
+        vector = np.asarray(result.data[0].embedding, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) + 1e-8)
+
+    def lookup(self, query: np.ndarray) -> str | None:
+        with self._lock:
+            if not self.prompts:
+                return None
+            scores = self.embeddings[:len(self.prompts)] @ query
+            best = int(np.argmax(scores))
+            if scores[best] >= self.threshold:
+                return self.replies[best]
+        return None
+
+    def add(self, query: np.ndarray, prompt: str, reply: str):
+        with self._lock:
+            if self.embeddings is None:
+                self.embeddings = np.zeros((self.max_entries, query.size), dtype=np.float32)
+            row = self._next
+            self.embeddings[row] = query
+            if row < len(self.prompts):
+                self.prompts[row], self.replies[row] = prompt, reply
+            else:
+                self.prompts.append(prompt)
+                self.replies.append(reply)
+            self._next = (row + 1) % self.max_entries
+
+semantic_cache = SemanticCache()
 
 ###############################################################################
 # -----------------------  SPEECH & AUDIO UTILS  ---------------------------- #
 ###############################################################################
 
-pygame.mixer.init(frequency=44_100, size=-16, channels=2, buffer=4096)
+# OpenAI's "pcm" speech format: raw 24 kHz mono 16‑bit samples, no decoding needed
+TTS_SAMPLE_RATE = 24_000
+TTS_CHUNK_BYTES = 4096
+# The first write of each sentence is 20 ms of audio; later writes double up
+# to TTS_CHUNK_BYTES
+TTS_FIRST_CHUNK_BYTES = TTS_SAMPLE_RATE * 2 // 50
 
 interrupted = False  # set by check_for_interruption()
-
-def check_for_interruption():
+playback_stream: sd.RawOutputStream | None = None  # stream currently playing, if any
+
+# One recognizer and one microphone stream, opened once and shared by every
+# listener – reopening PortAudio per call costs hundreds of ms. mic_lock keeps
+# two listeners from reading the stream at the same time.
+MIC_SAMPLE_RATE = 16_000  # what the wake‑word model expects
+WAKE_FRAME = 1280  # 80 ms of audio per wake‑word prediction
+recognizer = sr.Recognizer()
+recognizer.dynamic_energy_threshold = True  # tracks noise drift between calibrations
+microphone = sr.Microphone(sample_rate=MIC_SAMPLE_RATE)
+mic_source = microphone.__enter__()
+mic_lock = threading.Lock()
+
+
+def recalibrate(duration: float = 1.0):
+    """Measure ambient noise and reset the recognizer's energy threshold."""
+    with mic_lock:
+        recognizer.adjust_for_ambient_noise(mic_source, duration=duration)
+    logger.info(f"Energy threshold recalibrated to {recognizer.energy_threshold:.0f}")
+
+wake_model = WakeWordModel(wakeword_models=WAKE_WORD_MODELS or WAKE_WORD_BUILTINS)
+
+# Questions are streamed to OpenAI's realtime transcription while the user
+# speaks, so the transcript is ready moments after they stop. The API takes
+# 24 kHz pcm16; each 20 ms frame is resampled on the way out.
+REALTIME_URL = "wss://api.openai.com/v1/realtime?intent=transcription"
+REALTIME_SAMPLE_RATE = 24_000
+STT_FRAME = 320  # 20 ms at 16 kHz
+STT_RESULT_TIMEOUT = 10  # seconds to wait for the final transcript
+_FRAME_X = np.arange(STT_FRAME)
+_REALTIME_X = np.linspace(0, STT_FRAME - 1, STT_FRAME * REALTIME_SAMPLE_RATE // MIC_SAMPLE_RATE)
+
+def check_for_interruption(done: threading.Event):
+    """Listen for an interrupt keyword until `done` is set."""
     global interrupted
-    recognizer = sr.Recognizer()
-    recognizer.energy_threshold = 200
-    with sr.Microphone() as src:
-        while True:
-            try:
-                audio = recognizer.listen(src, timeout=1, phrase_time_limit=1)
-                text = recognizer.recognize_google(audio, language="en-US").lower()
-                if any(k in text for k in ("rainbow", "stop")):
-                    interrupted = True
-                    pygame.mixer.music.stop()
-                    logger.info("Interrupted by user – keyword detected.")
-                    break
-            except Exception:
-                # swallow recognizer errors in this tight loop
-                continue
+    while not done.is_set():
+        try:
+            with mic_lock:
+                audio = recognizer.listen(mic_source, timeout=1, phrase_time_limit=1)
+            text = recognizer.recognize_google(audio, language="en-US").lower()
+            if any(k in text for k in ("rainbow", "stop")):
+                interrupted = True
+                if playback_stream is not None:
+                    playback_stream.abort()
+                logger.info("Interrupted by user – keyword detected.")
+                break
+        except Exception:
+            # swallow recognizer errors in this tight loop
+            continue
+
+def _progressive_chunks(resp):
+    """Regroup streamed PCM into writes that start small and grow.
+
+    Playback starts as soon as 20 ms of a sentence has arrived; doubling the
+    write size from there keeps per-write overhead low once audio is flowing.
+    """
+    size = TTS_FIRST_CHUNK_BYTES
+    buf = bytearray()
+    for data in resp.iter_bytes():
+        buf += data
+        while len(buf) >= size:
+            yield bytes(buf[:size])
+            del buf[:size]
+            size = min(size * 2, TTS_CHUNK_BYTES)
+    if len(buf) > 1:
+        yield bytes(buf[:len(buf) & ~1])  # whole 16-bit samples only
+
 
 def speak(text: str) -> bool:
     """Return True if speech was interrupted."""
-    global interrupted
+    return speak_sentences((text,))
+
+
+def speak_sentences(sentences) -> bool:
+    """Speak each sentence as it arrives through one output stream.
+
+    The interruption listener and the output stream stay open for the whole
+    reply, so later sentences follow without a gap. Return True if speech was
+    interrupted.
+    """
+    global interrupted, playback_stream
+    # nothing is claimed until there is something to say, so the mic stays
+    # free while the reply is still being generated
+    sentences = iter(sentences)
+    first = next(sentences, None)
+    if first is None:
+        return False
     interrupted = False
-    update_display(status="Speaking", response=text)
+    update_display(status="Speaking")
 
-    # start background interruption listener
-    t = threading.Thread(target=check_for_interruption, daemon=True)
+    # start background interruption listener; it stops once speech is over
+    done = threading.Event()
+    t = threading.Thread(target=check_for_interruption, args=(done,), daemon=True)
     t.start()
 
+    # play audio as it streams in rather than after the whole file is synthesised
+    spoken = []
     try:
-        response = client.audio.speech.create(model=audio_model, voice=voice_name, input=text)
-        tmp_path = "temp_speech.mp3"
-        with open(tmp_path, "wb") as fh:
-            fh.write(response.content)
-        pygame.mixer.music.load(tmp_path)
-        pygame.mixer.music.play()
-        while pygame.mixer.music.get_busy() and not interrupted:
-            time.sleep(0.1)
+        # Low latency and 20 ms blocks, so the first progressive write is heard
+        # at once instead of waiting behind a large output buffer
+        with sd.RawOutputStream(
+            samplerate=TTS_SAMPLE_RATE, channels=1, dtype="int16",
+            blocksize=TTS_FIRST_CHUNK_BYTES // 2, latency="low",
+        ) as stream:
+            playback_stream = stream
+            for sentence in chain((first,), sentences):
+                if interrupted:
+                    break
+                spoken.append(sentence)
+                update_display(response=" ".join(spoken))
+                with client.audio.speech.with_streaming_response.create(
+                    model=audio_model, voice=voice_name, input=sentence, response_format="pcm"
+                ) as resp:
+                    for chunk in _progressive_chunks(resp):
+                        if interrupted:
+                            break
+                        stream.write(chunk)
     except Exception as exc:
-        logger.error(f"TTS failure: {exc}")
+        # aborting the stream on interruption makes the pending write fail
+        if not interrupted:
+            logger.error(f"TTS failure: {exc}")
     finally:
-        pygame.mixer.music.unload()
-        if os.path.exists(tmp_path):
-            os.remove(tmp_path)
+        playback_stream = None
+        done.set()
 
     return interrupted
 
@@ -505,123 +838,302 @@ def speak(text: str) -> bool:
 # ------------------------  OPENAI CHAT RESPONSE  --------------------------- #
 ###############################################################################
 
-def get_response(user_text: str) -> str:
-    # quick shortcuts for history‑related queries
-    low = user_text.lower()
-    if "first interaction" in low or "first conversation" in low:
-        first = conversation_history.first()
-        if first:
-            return f"Our first interaction was at {first['timestamp']}. You said: '{first['user']}' and I responded: '{first['robot']}'."
-        return "I don't have any previous interactions recorded."
-    if "last interaction" in low or "previous conversation" in low:
-        last = conversation_history.last()
-        if last:
-            return f"Our last interaction was at {last['timestamp']}. You said: '{last['user']}' and I responded: '{last['robot']}'."
-        return "I don't have any previous interactions recorded."
-    if "recent interactions" in low or "recent conversations" in low:
-        recent = conversation_history.recent()
-        if recent:
-            return "\n".join(
-                f"At {r['timestamp']} – You: '{r['user']}'  Me: '{r['robot']}'" for r in recent
-            )
-        return "No recent interactions."
-    if any(k in low for k in ("repeat", "say that again", "repeat that")):
-        last = conversation_history.last()
-        return last['robot'] if last else "Nothing to repeat yet."
-
-    # regular chat completion
+# Built once and sent as an identical prefix on every call, so OpenAI's
+# automatic prompt caching can reuse it once it passes 1024 tokens
+SYSTEM_PROMPT = (
+    "You are a humanoid robot assistant with extensive robotics knowledge. "
+    "Respond in 2‑3 concise sentences, friendly and engaging. Maintain identity as HMND‑01.\n\n"
+    f"{ROBOTICS_KNOWLEDGE}\n\n{ROBOT_IDENTITY}"
+)
+SYSTEM_MSG = {"role": "system", "content": SYSTEM_PROMPT}
+
+# A sentence ends at ., ! or ? followed by whitespace
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# "Repeat that" must replay the exact words, so it skips the model
+REPEAT_RE = re.compile(r"\b(?:repeat(?: that)?|say that again)\b", re.I)
+
+
+def _repeat_last() -> str:
+    last = conversation_history.last()
+    return last['robot'] if last else "Nothing to repeat yet."
+
+
+def _chat_messages(user_text: str, turns: list[dict[str, str]]) -> list[dict[str, str]]:
+    """System prompt, the last few turns, then the new question."""
+    messages = [SYSTEM_MSG]
+    for turn in turns:
+        messages.append({"role": "user", "content": turn["user"]})
+        messages.append({"role": "assistant", "content": turn["robot"]})
+    messages.append({"role": "user", "content": user_text})
+    return messages
+
+
+def get_response(user_text: str):
+    """Yield the reply to `user_text` one sentence at a time as it is generated."""
+    if REPEAT_RE.search(user_text):
+        yield _repeat_last()
+        return
+
+    # A reply given with earlier turns in the prompt may depend on them ("why?"),
+    # so the caches only serve and store questions asked without context
+    turns = conversation_history.recent(HISTORY_TURNS)
+    # exact repeats first, then near-duplicates from the semantic cache
+    cacheable = not turns and not NO_CACHE_RE.search(user_text)
+    query = None
+    if cacheable:
+        key = ExactCache.key(user_text)
+        cached = exact_cache.get(key)
+        if cached is not None:
+            logger.info("Exact cache hit")
+            yield cached
+            return
+
+        query = semantic_cache.embed(user_text)
+        if query is not None:
+            cached = semantic_cache.lookup(query)
+            if cached is not None:
+                logger.info("Semantic cache hit")
+                exact_cache.put(key, cached)
+                yield cached
+                return
+
+    # regular chat completion, streamed so speech can start on the first sentence
+    parts = []
     try:
-        completion = client.chat.completions.create(
+        stream = client.chat.completions.create(
             model=chat_model,
             temperature=0.5,
             max_tokens=500,
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are a humanoid robot assistant with extensive robotics knowledge. "
-                        "Respond in 2‑3 concise sentences, friendly and engaging. Maintain identity as HMND‑01.\n\n"
-                        f"{ROBOTICS_KNOWLEDGE}\n\n{ROBOT_IDENTITY}"
-                    ),
-                },
-                {"role": "user", "content": user_text},
-            ],
+            stream=True,
+            messages=_chat_messages(user_text, turns),
         )
-        return completion.choices[0].message.content
+        buffer = ""
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            buffer += chunk.choices[0].delta.content or ""
+            *complete, buffer = _SENTENCE_END.split(buffer)
+            for sentence in complete:
+                parts.append(sentence)
+                yield sentence
+        if buffer.strip():
+            parts.append(buffer.strip())
+            yield buffer.strip()
     except Exception as exc:
         logger.error(f"OpenAI chat error: {exc}")
-        return "I'm having trouble thinking right now. Please try again later."
+        if not parts:
+            yield "I'm having trouble thinking right now. Please try again later."
+        return
+
+    if cacheable and parts:
+        reply = " ".join(parts)
+        exact_cache.put(key, reply)
+        if query is not None:
+            semantic_cache.add(query, user_text, reply)
 
 ###############################################################################
 # -----------------------------  LISTENING  --------------------------------- #
 ###############################################################################
 
-is_active = False  # becomes True after wake word
+wake_event = threading.Event()  # set by the wake word, cleared on sleep
 
 def listen_for_wake_word():
-    global is_active
-    recognizer = sr.Recognizer()
-    recognizer.energy_threshold = 100
-    recognizer.dynamic_energy_threshold = True
-    recognizer.pause_threshold = 0.5
-
-    logger.info("Robot is sleeping. Say 'Hey robot', 'Hey robo', or 'Wake up' to activate me!")
+    if WAKE_WORD_MODELS:
+        logger.info("Robot is sleeping. Say 'Hey robot', 'Hey robo', or 'Wake up' to activate me!")
+    else:
+        logger.info(f"Robot is sleeping. Say '{WAKE_WORD_BUILTINS[0].replace('_', ' ')}' to activate me!")
     update_display(status="Sleeping")
 
-    with sr.Microphone() as src:
-        recognizer.adjust_for_ambient_noise(src, duration=1)
+    wake_model.reset()
+    while True:
+        try:
+            with mic_lock:
+                frame = mic_source.stream.read(WAKE_FRAME)
+            scores = wake_model.predict(np.frombuffer(frame, dtype=np.int16))
+            if max(scores.values()) >= WAKE_WORD_THRESHOLD:
+                logger.info("Wake word detected → robot active")
+                update_display(status="Active", message="Wake word")
+                speak("Hello! I am HMND‑01, your humanoid robot assistant. How can I help you today?")
+                wake_event.set()
+                break
+        except Exception as exc:
+            logger.error(f"Wake‑word error: {exc}")
+
+
+def _ws_json(message: dict) -> str:
+    """Serialise a realtime API message; it must go out as a text frame, not bytes."""
+    return _dumps(message).decode()
+
+
+def _to_realtime_audio(frame: bytes) -> str:
+    """Resample one 16 kHz microphone frame to 24 kHz pcm16 and base64‑encode it."""
+    samples = np.frombuffer(frame, dtype=np.int16)
+    resampled = np.interp(_REALTIME_X, _FRAME_X, samples)
+    return base64.b64encode(resampled.astype(np.int16).tobytes()).decode()
+
+
+def _stream_turn(ws, timeout: float, phrase_time_limit: float) -> str | None:
+    """Send microphone audio until the server finishes transcribing one utterance."""
+    deadline = time.monotonic() + timeout
+    started_at = None
+    committed = False
+    partial = ""
+    with mic_lock:
         while True:
-            try:
-                audio = recognizer.listen(src, timeout=5, phrase_time_limit=3)
-                text = recognizer.recognize_google(audio, language="en-US").lower()
-                logger.info(f"Heard: {text}")  # Log what was heard
-                
-                # Check for wake words
-                wake_words = ["hey robot", "hey robo", "wake up"]
-                if any(wake_word in text for wake_word in wake_words):
-                    is_active = True
-                    logger.info("Wake word detected → robot active")
-                    update_display(status="Active", message="Wake word")
-                    speak("Hello! I am HMND‑01, your humanoid robot assistant. How can I help you today?")
+            now = time.monotonic()
+            if not committed:
+                frame = mic_source.stream.read(STT_FRAME)
+                ws.send(_ws_json({"type": "input_audio_buffer.append", "audio": _to_realtime_audio(frame)}))
+                if started_at is None and now > deadline:
+                    logger.warning("No speech detected (timeout)")
+                    return None
+                if started_at is not None and now - started_at > phrase_time_limit:
+                    ws.send(_ws_json({"type": "input_audio_buffer.commit"}))
+                    committed = True
+
+            # handle every event that has arrived; once committed, wait for the transcript
+            while True:
+                try:
+                    event = _loads(ws.recv(timeout=STT_RESULT_TIMEOUT if committed else 0))
+                except TimeoutError:
+                    if committed:
+                        logger.warning("Timed out waiting for transcript")
+                        return partial or None
                     break
-            except (sr.WaitTimeoutError, sr.UnknownValueError):
-                continue
-            except Exception as exc:
-                logger.error(f"Wake‑word error: {exc}")
+                kind = event.get("type")
+                if kind == "input_audio_buffer.speech_started":
+                    started_at = now
+                elif kind == "input_audio_buffer.speech_stopped":
+                    committed = True  # server VAD commits the buffer itself
+                elif kind == "conversation.item.input_audio_transcription.delta":
+                    partial += event.get("delta", "")
+                    update_display(message=partial)
+                elif kind == "conversation.item.input_audio_transcription.completed":
+                    return event.get("transcript", "").strip()
+                elif kind == "error":
+                    raise RuntimeError(event.get("error", {}).get("message", "realtime API error"))
 
 
 def get_speech_input(timeout: int = 20, phrase_time_limit: int = 15):
-    recognizer = sr.Recognizer()
-    recognizer.dynamic_energy_threshold = True
-    recognizer.energy_threshold = 200
-    recognizer.pause_threshold = 1.0
-    recognizer.non_speaking_duration = 0.5
-    recognizer.phrase_threshold = 0.3
-
-    with sr.Microphone() as src:
-        update_display(status="Listening")
-        logger.info("Listening for user question …")
+    """Stream the user's question to OpenAI realtime transcription and return the final text."""
+    update_display(status="Listening")
+    logger.info("Listening for user question …")
+    try:
+        with connect(REALTIME_URL, additional_headers={
+            "Authorization": f"Bearer {api_key}",
+            "OpenAI-Beta": "realtime=v1",
+        }) as ws:
+            ws.send(_ws_json({
+                "type": "transcription_session.update",
+                "session": {
+                    "input_audio_format": "pcm16",
+                    "input_audio_transcription": {"model": stt_model, "language": "en"},
+                    "turn_detection": {"type": "server_vad", "silence_duration_ms": 500},
+                },
+            }))
+            text = _stream_turn(ws, timeout, phrase_time_limit)
+    except Exception as exc:
+        logger.error(f"Recognizer error: {exc}")
+        return None
+
+    if not text:
+        logger.warning("Could not understand audio")
+        return None
+    logger.info(f"Heard user input: {text}")
+    
+    # Check if the input contains wake words
+    wake_words = ["hey robot", "hey robo", "wake up"]
+    if any(wake_word in text.lower() for wake_word in wake_words):
+        logger.info("Wake word detected in user input - ignoring")
+        return None
+        
+    update_display(message=text)
+    return text
+
+###############################################################################
+# -----------------------------  PIPELINE  ---------------------------------- #
+###############################################################################
+
+# STT -> LLM -> TTS, each stage on its own thread. The LLM stage hands the reply
+# to the TTS stage sentence by sentence as the chat API streams it, so speech
+# starts on the first sentence while the rest is still being generated; tts_done tells the STT stage the reply is over and the mic is free.
+stt_out: queue.Queue = queue.Queue(maxsize=1)
+llm_out: queue.Queue = queue.Queue(maxsize=8)
+tts_done: queue.Queue = queue.Queue(maxsize=1)
+_END_OF_TURN = object()  # closes one reply on llm_out
+MAX_SILENCE = 3
+
+
+def stt_loop():
+    """Capture one question per turn while awake, then wait for the reply."""
+    while True:
+        wake_event.wait()  # sleeps until the wake word is heard
+        stt_out.put(get_speech_input())
+        tts_done.get()
+
+        # the reply sent the robot to sleep: go back to the wake word
+        if not wake_event.is_set():
+            threading.Thread(target=listen_for_wake_word, daemon=True).start()
+
+
+def llm_loop():
+    """Turn each transcript into reply sentences for the TTS stage."""
+    global interrupted
+    silence_count = 0
+    while True:
+        user_text = stt_out.get()
+        interrupted = False  # nothing is playing yet; clear the last reply's flag
         try:
-            recognizer.adjust_for_ambient_noise(src, duration=1)
-            audio = recognizer.listen(src, timeout=timeout, phrase_time_limit=phrase_time_limit)
-            text = recognizer.recognize_google(audio, language="en-US")
-            logger.info(f"Heard user input: {text}")
-            
-            # Check if the input contains wake words
-            wake_words = ["hey robot", "hey robo", "wake up"]
-            if any(wake_word in text.lower() for wake_word in wake_words):
-                logger.info("Wake word detected in user input - ignoring")
-                return None
-                
-            update_display(message=text)
-            return text
-        except sr.WaitTimeoutError:
-            logger.warning("No speech detected (timeout)")
-        except sr.UnknownValueError:
-            logger.warning("Could not understand audio")
+            if not user_text:
+                silence_count += 1
+                if silence_count >= MAX_SILENCE:
+                    llm_out.put("No speech detected for too long. Going back to sleep. Say 'Hey robot' to wake me up!")
+                    silence_count = 0
+                    wake_event.clear()
+                else:
+                    llm_out.put(f"I didn't catch that. Please try again. {MAX_SILENCE - silence_count} attempts remaining.")
+                continue
+
+            silence_count = 0
+
+            if "goodbye" in user_text.lower():
+                llm_out.put("Goodbye! Have a great day! Say 'Hey robot' when you need me again!")
+                wake_event.clear()
+                continue
+
+            parts = []
+            reply = get_response(user_text)
+            try:
+                for sentence in reply:
+                    parts.append(sentence)
+                    llm_out.put(sentence)
+                    if interrupted:
+                        break  # the user cut in; stop generating
+            finally:
+                reply.close()
+            conversation_history.add(user_text, " ".join(parts))
         except Exception as exc:
-            logger.error(f"Recognizer error: {exc}")
-        return None
+            logger.error(f"Error handling turn: {exc}")
+        finally:
+            llm_out.put(_END_OF_TURN)
+
+
+def _reply_sentences():
+    """Yield the sentences of one reply from llm_out."""
+    while (sentence := llm_out.get()) is not _END_OF_TURN:
+        yield sentence
+
+
+def tts_loop():
+    """Speak each reply as its sentences arrive."""
+    while True:
+        sentences = _reply_sentences()
+        if speak_sentences(sentences):
+            logger.info("Speech was interrupted by the user.")
+        for _ in sentences:  # drop what is left of an interrupted reply
+            pass
+        tts_done.put(True)
 
 ###############################################################################
 # -------------------------------  MAIN  ------------------------------------ #
@@ -629,11 +1141,14 @@ def get_speech_input(timeout: int = 20, phrase_time_limit: int = 15):
 
 def run_flask():
     logger.info("Starting Flask UI on http://localhost:5000 …")
-    app.run(host="0.0.0.0", port=5000, debug=False, use_reloader=False)
+    # waitress instead of the Werkzeug dev server. Each open /stream holds a
+    # worker thread, so the pool is sized well above the expected browsers;
+    # send_bytes=1 flushes every SSE message instead of buffering it.
+    serve(app, host="0.0.0.0", port=5000, threads=16, connection_limit=200,
+          channel_timeout=30, send_bytes=1)
 
 
 def main():
-    global is_active
     parser = argparse.ArgumentParser(description="HMND‑01 Voice Assistant with Web UI")
     parser.add_argument("--message", type=str, help="Speak a single message then exit")
     args = parser.parse_args()
@@ -648,48 +1163,21 @@ def main():
         speak(args.message)
         return
 
+    threading.Thread(target=warm_up_client, daemon=True).start()
+
+    # calibrate once; dynamic_energy_threshold follows drift from here on
+    recalibrate()
+
     # launch wake‑word listener
     wake_thread = threading.Thread(target=listen_for_wake_word, daemon=True)
     wake_thread.start()
 
-    silence_count = 0
-    max_silence = 3
-
     logger.info("Say 'Hey robot' to wake me up. 'Rainbow' or 'Stop' to interrupt. 'Goodbye' to end.")
 
-    while True:
-        if not is_active:  # still sleeping
-            time.sleep(0.1)
-            continue
-
-        user_text = get_speech_input()
-        if not user_text:
-            silence_count += 1
-            if silence_count >= max_silence:
-                speak("No speech detected for too long. Going back to sleep. Say 'Hey robot' to wake me up!")
-                is_active = False
-                wake_thread = threading.Thread(target=listen_for_wake_word, daemon=True)
-                wake_thread.start()
-            else:
-                speak(f"I didn't catch that. Please try again. {max_silence - silence_count} attempts remaining.")
-            continue
-
-        silence_count = 0
-
-        if "goodbye" in user_text.lower():
-            speak("Goodbye! Have a great day! Say 'Hey robot' when you need me again!")
-            is_active = False
-            wake_thread = threading.Thread(target=listen_for_wake_word, daemon=True)
-            wake_thread.start()
-            continue
-
-        robot_reply = get_response(user_text)
-        interrupted_speech = speak(robot_reply)
-        conversation_history.add(user_text, robot_reply)
-        update_display(response=robot_reply)
-
-        if interrupted_speech:
-            logger.info("Speech was interrupted by the user.")
+    stages = [threading.Thread(target=stage, daemon=True) for stage in (stt_loop, llm_loop, tts_loop)]
+    for stage in stages:
+        stage.start()
+    stages[0].join()
 
 
 if __name__ == "__main__":
@@ -11,7 +11,8 @@ HMND-01 dashboard that mirrors the terminal interaction.
 
 Requirements
 ============
-    pip install flask sounddevice numpy pyttsx3 faster-whisper ollama
+    pip install flask waitress sounddevice webrtcvad numpy pyttsx3 faster-whisper openwakeword ollama
+    ollama pull all-minilm   # optional: embeddings for the response cache
 
 Tested on Python 3.10+ (Linux/macOS/Windows).
 """
@@ -73,25 +74,31 @@ SYSTEM_TONE = (
     f"{ROBOTICS_KNOWLEDGE}\n\n"
     f"{ROBOT_IDENTITY}\n\n"
     "Provide concise (≤3-sentence) spoken-friendly answers in a friendly tone, "
-    "using your robotics knowledge when relevant and always acting as a Humanoid HMND robot.\n\n"
-    "User: {user}\nRobot:"
+    "using your robotics knowledge when relevant and always acting as a Humanoid HMND robot."
 )
 
 ###############################################################################
 # --------------------------------- IMPORTS --------------------------------- #
 ###############################################################################
-import argparse, logging, threading, time, os, signal, sys, json
+import argparse, logging, threading, time, os, signal, sys, json, re, queue, hashlib, wave, atexit, gzip, sqlite3
+import concurrent.futures
 from datetime import datetime
-from collections import deque
+from collections import deque, OrderedDict
+from itertools import islice
 
 import numpy as np
 import sounddevice as sd
+import webrtcvad
 import pyttsx3
 from faster_whisper import WhisperModel
 from ollama import Client
 
+from keywords import NO_CACHE_RE, make_classifier
+from sts_local_common import STOP_WORD_MODELS, STOP_WORD_BUILTINS, StopWordSpotter
+
 # Flask UI
-from flask import Flask, jsonify, render_template_string
+from flask import Flask, Response, jsonify, request
+from waitress import serve
 
 ###############################################################################
 # -------------------------  LOGGER CONFIGURATION --------------------------- #
@@ -103,23 +110,71 @@ logging.basicConfig(
 )
 log = logging.getLogger("RainbowRobot")
 
+###############################################################################
+# ---------------------------  KEYWORD MATCHING ----------------------------- #
+###############################################################################
+# History questions answered from the log instead of the LLM, tagged by the
+# handler that answers them
+HISTORY_PHRASES = {
+    "first interaction"    : "first",
+    "first conversation"   : "first",
+    "last interaction"     : "last",
+    "previous conversation": "previous",
+    "recent interactions"  : "recent",
+    "recent conversations" : "recent",
+    "repeat"               : "repeat",
+}
+
+# Wake/stop/quit words and history phrases are matched in one scan
+_WORD_TAGS = {
+    **{w: "wake" for w in WAKE_WORDS},
+    **{w: "stop" for w in STOP_WORDS},
+    **{w: "quit" for w in QUIT_WORDS},
+    **HISTORY_PHRASES,
+}
+# Returns the tags found in a transcript: "wake", "stop", "quit" or a history query kind
+classify = make_classifier(_WORD_TAGS)
+
 ###############################################################################
 # ----------------------  REAL-TIME WEB-UI (Flask)  ------------------------- #
 ###############################################################################
-# Shared state between robot threads and Flask
-display_lock  = threading.Lock()
-display_state = {
+# Shared state between robot threads and Flask. Writers build a new dict and
+# rebind _display_snapshot (atomic under the GIL), so readers just take the
+# current reference without locking; display_lock only serialises writers.
+# Every update bumps display_version and wakes the /stream generators waiting
+# on display_changed.
+display_lock    = threading.Lock()
+display_changed = threading.Condition(display_lock)
+display_version = 0
+_display_snapshot = {
     "status"  : "sleeping",  # sleeping | listening | thinking | speaking
     "message" : "",
     "response": "",
     "time"    : datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
 }
 
+# The formatted timestamp only changes once a second, so it is cached
+_last_ts_second = 0
+_last_ts_str = ""
+
+def _timestamp() -> str:
+    global _last_ts_second, _last_ts_str
+    sec = int(time.time())
+    if sec != _last_ts_second:
+        _last_ts_str = datetime.fromtimestamp(sec).strftime("%Y-%m-%d %H:%M:%S")
+        _last_ts_second = sec
+    return _last_ts_str
+
 def _update_display(**kwargs):
     """Thread-safe helper the robot uses to push updates to the UI."""
+    global display_version, _display_snapshot
     with display_lock:
-        display_state.update(kwargs)
-        display_state["time"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        new = dict(_display_snapshot)
+        new.update(kwargs)
+        new["time"] = _timestamp()
+        _display_snapshot = new
+        display_version += 1
+        display_changed.notify_all()
 
 # Flask application
 app = Flask(__name__)
@@ -364,55 +419,53 @@ HTML_TEMPLATE = r"""
       let lastMessage = '';
       let lastResponse = '';
       
-      function updateDisplay() {
-        fetch('/get_display').then(r => r.json()).then(data => {
-          const statusContainer = document.getElementById('status-container');
-          const thinkingEmoji = document.getElementById('thinking-emoji');
-          const statusText = document.getElementById('status-text');
-          const currentStatus = data.status.toLowerCase();
+      function applyUpdate(data) {
+        const statusContainer = document.getElementById('status-container');
+        const thinkingEmoji = document.getElementById('thinking-emoji');
+        const statusText = document.getElementById('status-text');
+        const currentStatus = data.status.toLowerCase();
+        
+        if (currentStatus !== lastStatus) {
+          statusContainer.className = 'status-container ' + currentStatus;
+          lastStatus = currentStatus;
           
-          if (currentStatus !== lastStatus) {
-            statusContainer.className = 'status-container ' + currentStatus;
-            lastStatus = currentStatus;
-            
-            // Show/hide thinking emoji and update status text
-            if (currentStatus === 'thinking') {
-              thinkingEmoji.style.display = 'inline-block';
-              statusText.textContent = 'Thinking...';
-            } else {
-              thinkingEmoji.style.display = 'none';
-              statusText.textContent = 'Status: ' + data.status;
-            }
-          }
-          
-          if (data.message !== lastMessage) {
-            const messageContainer = document.getElementById('message-container');
-            messageContainer.style.animation = 'none';
-            messageContainer.offsetHeight;
-            messageContainer.style.animation = 'fadeInUp 0.5s forwards';
-            
-            const messageText = data.message ? data.message : 'No message yet';
-            document.getElementById('message').innerText = messageText;
-            lastMessage = data.message;
+          // Show/hide thinking emoji and update status text
+          if (currentStatus === 'thinking') {
+            thinkingEmoji.style.display = 'inline-block';
+            statusText.textContent = 'Thinking...';
+          } else {
+            thinkingEmoji.style.display = 'none';
+            statusText.textContent = 'Status: ' + data.status;
           }
+        }
+        
+        if (data.message !== lastMessage) {
+          const messageContainer = document.getElementById('message-container');
+          messageContainer.style.animation = 'none';
+          messageContainer.offsetHeight;
+          messageContainer.style.animation = 'fadeInUp 0.5s forwards';
           
-          if (data.response !== lastResponse) {
-            const responseContainer = document.getElementById('response-container');
-            responseContainer.style.animation = 'none';
-            responseContainer.offsetHeight;
-            responseContainer.style.animation = 'fadeInUp 0.5s forwards';
-            
-            const responseText = data.response ? data.response : 'No response yet';
-            document.getElementById('response').innerText = responseText;
-            lastResponse = data.response;
-          }
+          const messageText = data.message ? data.message : 'No message yet';
+          document.getElementById('message').innerText = messageText;
+          lastMessage = data.message;
+        }
+        
+        if (data.response !== lastResponse) {
+          const responseContainer = document.getElementById('response-container');
+          responseContainer.style.animation = 'none';
+          responseContainer.offsetHeight;
+          responseContainer.style.animation = 'fadeInUp 0.5s forwards';
           
-          document.getElementById('time').innerText = data.time;
-        });
+          const responseText = data.response ? data.response : 'No response yet';
+          document.getElementById('response').innerText = responseText;
+          lastResponse = data.response;
+        }
+        
+        document.getElementById('time').innerText = data.time;
       }
       
-      setInterval(updateDisplay, 1000);
-      window.onload = updateDisplay;
+      // The server pushes the display state whenever it changes
+      new EventSource('/stream').onmessage = e => applyUpdate(JSON.parse(e.data));
     </script>
 </head>
 <body>
@@ -450,21 +503,61 @@ HTML_TEMPLATE = r"""
 </html>
 """
 
+# Parse the template once; requests only render it
+_TEMPLATE = app.jinja_env.from_string(HTML_TEMPLATE)
+
+# The rendered page is cached per display snapshot together with its gzipped
+# form and an ETag, so page loads only render and compress after a change
+_page_cache = (None, b"", b"", "")
+
+def _page():
+    global _page_cache
+    snapshot = _display_snapshot
+    if _page_cache[0] is not snapshot:
+        html = _TEMPLATE.render(**snapshot).encode("utf-8")
+        _page_cache = (snapshot, html, gzip.compress(html, compresslevel=9), hashlib.sha1(html).hexdigest())
+    return _page_cache[1:]
+
 @app.route("/")
 def index():
-    with display_lock:
-        data = display_state.copy()
-    return render_template_string(HTML_TEMPLATE, **data)
+    html, html_gz, etag = _page()
+    gzipped = "gzip" in request.headers.get("Accept-Encoding", "")
+    resp = Response(html_gz if gzipped else html, mimetype="text/html")
+    if gzipped:
+        resp.headers["Content-Encoding"] = "gzip"
+        etag += "-gz"
+    resp.headers["Vary"] = "Accept-Encoding"
+    resp.headers["Cache-Control"] = "no-cache"  # revalidate; a matching ETag gets a 304
+    resp.set_etag(etag)
+    return resp.make_conditional(request)
 
 @app.route("/get_display")
 def get_display():
-    with display_lock:
-        return jsonify(display_state)
+    return jsonify(_display_snapshot)
+
+@app.route("/stream")
+def stream():
+    """Server-sent events: one message per display change, plus keep-alives."""
+    def events():
+        seen = -1
+        while True:
+            with display_changed:
+                display_changed.wait_for(lambda: display_version != seen, timeout=15)
+                changed = display_version != seen
+                seen = display_version
+                snapshot = _display_snapshot
+            yield f"data: {json.dumps(snapshot)}\n\n" if changed else ": keep-alive\n\n"
+
+    return Response(events(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 def start_ui_server(host="0.0.0.0", port=5050):
     """Run Flask in a daemon thread so it never blocks the robot."""
+    # waitress instead of the Werkzeug dev server. Each open /stream holds a
+    # worker thread, so the pool is sized well above the expected browsers;
+    # send_bytes=1 flushes every SSE message instead of buffering it.
     threading.Thread(
-        target=lambda: app.run(host=host, port=port, threaded=True, use_reloader=False),
+        target=lambda: serve(app, host=host, port=port, threads=16, connection_limit=200,
+                             channel_timeout=30, send_bytes=1),
         daemon=True,
     ).start()
     log.info(f"🌐 Web-UI running on http://{host}:{port}")
@@ -472,101 +565,162 @@ def start_ui_server(host="0.0.0.0", port=5050):
 ###############################################################################
 # --------------------------  SPEECH RECOGNITION ---------------------------- #
 ###############################################################################
+
 class SpeechRecognizer:
-    def __init__(self, model_id: str, device: str):
+    def __init__(self, model_id: str, device: str, compute_type: str | None = None):
         log.info(f'Loading Whisper model "{model_id}" …')
-        self.model = WhisperModel(model_id, device=device, compute_type="float16" if device == "cuda" else "int8")
+        self.model = WhisperModel(
+            model_id,
+            device=device,
+            compute_type=compute_type or ("int8_float16" if device == "cuda" else "int8"),
+            cpu_threads=max(1, (os.cpu_count() or 2) // 2),
+            num_workers=1,
+        )
         self.sample_rate = 16000
-        self.chunk_size = 1024
-        self.threshold = 0.005  # Lowered threshold for better voice detection
+        self.frame_size = 320  # 20 ms frames, as webrtcvad expects
         self.min_speech_duration = 0.3  # Minimum duration of speech to consider
         self.max_speech_duration = 15.0  # Maximum duration to process
-        self.speech_pad = 0.2  # Padding around speech segments
+        self.speech_pad = 0.2  # Audio kept from before speech starts
+        self.end_silence = 0.3  # Trailing silence that ends an utterance
+
+        # Capture state shared with the audio callback
+        self._vad = webrtcvad.Vad(2)
+        self._buf = np.empty(int(self.max_speech_duration * self.sample_rate), dtype=np.int16)
+        self._fbuf = np.empty(self._buf.size, dtype=np.float32)
+        self._pad_frames = int(self.speech_pad * self.sample_rate) // self.frame_size
+        self._pad = np.zeros(self._pad_frames * self.frame_size, dtype=np.int16)
+        self._end_frames = int(self.end_silence * self.sample_rate) // self.frame_size
+        self._lock = threading.Lock()
+        self._listen_lock = threading.Lock()
+        self._utterance_done = threading.Event()
+        self._recording = False
+        self._reset_capture()
+
+        # Stop words are spotted on the same stream while a reply is playing
+        self._stop_words = StopWordSpotter()
+
+        # One input stream stays open for the life of the recognizer
+        self._stream = sd.RawInputStream(
+            samplerate=self.sample_rate,
+            blocksize=self.frame_size,
+            dtype="int16",
+            channels=1,
+            callback=self._callback,
+        )
+        self._stream.start()
 
-    def _normalize_audio(self, audio):
-        """Normalize audio to improve voice detection."""
-        return audio / (np.max(np.abs(audio)) + 1e-8)  # Added small epsilon to prevent division by zero
+        # Transcription runs on its own worker so capture can move on right away
+        self._stt_pool = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="stt")
+        self._stt_pool.submit(self._warm_up)
 
-    def _detect_voice_activity(self, audio):
-        """Enhanced voice activity detection using energy and zero-crossing rate."""
-        # Calculate energy
-        energy = np.mean(np.square(audio))
-        
-        # Calculate zero-crossing rate
-        zero_crossings = np.sum(np.abs(np.diff(np.signbit(audio))))
-        zcr = zero_crossings / (len(audio) - 1)
-        
-        # Combined detection using both metrics
-        return energy > self.threshold or (energy > self.threshold * 0.5 and zcr > 0.1)
-
-    def _find_strongest_signal(self, audio, sr):
-        """Find the segment with the strongest voice signal with improved context."""
-        # Split audio into smaller chunks for more precise detection
-        chunk_length = int(0.3 * sr)  # 0.3 second chunks for finer granularity
-        chunks = [audio[i:i + chunk_length] for i in range(0, len(audio), chunk_length)]
-        
-        # Calculate energy for each chunk
-        energies = [np.mean(np.square(chunk)) for chunk in chunks]
-        
-        # Find chunks above threshold
-        above_threshold = [i for i, e in enumerate(energies) if e > self.threshold]
-        
-        if not above_threshold:
-            return audio  # Return full audio if no clear signal found
-        
-        # Find the longest continuous segment above threshold
-        segments = []
-        current_segment = [above_threshold[0]]
-        
-        for i in range(1, len(above_threshold)):
-            if above_threshold[i] - above_threshold[i-1] <= 2:  # Allow small gaps
-                current_segment.append(above_threshold[i])
-            else:
-                segments.append(current_segment)
-                current_segment = [above_threshold[i]]
-        segments.append(current_segment)
-        
-        # Find the longest segment
-        longest_segment = max(segments, key=len)
-        
-        # Add padding before and after
-        start_idx = max(0, longest_segment[0] - 1)
-        end_idx = min(len(chunks), longest_segment[-1] + 2)
-        
-        return np.concatenate(chunks[start_idx:end_idx])
-
-    @staticmethod
-    def _record(seconds=3, sr=16_000):
-        """Record audio with improved voice detection."""
-        audio = sd.rec(int(seconds * sr), samplerate=sr, channels=1, dtype="int16")
-        sd.wait()
-        return (audio.flatten().astype(np.float32) / 32768.0, sr)
+    def _warm_up(self):
+        """Run throwaway transcriptions so the first real turn finds the model warm."""
+        noise = np.random.default_rng(0).normal(0.0, 0.05, self.sample_rate).astype(np.float32)
+        try:
+            for audio in (np.zeros(self.sample_rate, dtype=np.float32), noise):
+                segments, _ = self.model.transcribe(
+                    audio, language="en", beam_size=1, without_timestamps=True,
+                    condition_on_previous_text=False,
+                )
+                list(segments)
+            log.info("Whisper warmed up")
+        except Exception as e:
+            log.warning(f"Whisper warm-up failed: {e}")
+
+    def _reset_capture(self):
+        self._write_idx = 0
+        self._pad_idx = 0
+        self._heard_speech = False
+        self._silent_frames = 0
+
+    def _callback(self, indata, frames, time_info, status):
+        """Copy each 20 ms frame into the capture buffer and run the VAD on it."""
+        if frames != self.frame_size:
+            return
+        frame = np.frombuffer(indata, dtype=np.int16)
+        self._stop_words.push(frame)
+
+        with self._lock:
+            if not self._recording:
+                return
+            is_speech = self._vad.is_speech(bytes(indata), self.sample_rate)
+
+            if not self._heard_speech:
+                if not is_speech:
+                    # Keep the last few frames so the start of a word is not clipped
+                    slot = (self._pad_idx % self._pad_frames) * self.frame_size
+                    self._pad[slot:slot + self.frame_size] = frame
+                    self._pad_idx += 1
+                    return
+                self._heard_speech = True
+                # Pre-roll in time order: at most two slice copies out of the ring
+                head = (self._pad_idx % self._pad_frames) * self.frame_size
+                wrapped = self._pad_idx >= self._pad_frames
+                for part in ((self._pad[head:], self._pad[:head]) if wrapped else (self._pad[:head],)):
+                    self._buf[self._write_idx:self._write_idx + part.size] = part
+                    self._write_idx += part.size
+
+            n = min(self.frame_size, self._buf.size - self._write_idx)
+            self._buf[self._write_idx:self._write_idx + n] = frame[:n]
+            self._write_idx += n
+            self._silent_frames = 0 if is_speech else self._silent_frames + 1
+
+            if self._silent_frames >= self._end_frames or self._write_idx >= self._buf.size:
+                self._recording = False
+                self._utterance_done.set()
+
+    def _record(self, seconds=3):
+        """Wait up to `seconds` (forever if None) for speech and return it once the speaker pauses."""
+        with self._lock:
+            self._reset_capture()
+            self._utterance_done.clear()
+            self._recording = True
+
+        # An utterance that has started may run past `seconds` until the
+        # speaker pauses or the buffer fills
+        if not self._utterance_done.wait(seconds):
+            with self._lock:
+                started = self._heard_speech
+            if started:
+                self._utterance_done.wait(self.max_speech_duration)
+
+        with self._lock:
+            self._recording = False
+            audio = self._buf[:self._write_idx]
+            if not audio.size:
+                return self._fbuf[:0]
+            # Peak-normalize while casting: the peak is read off the int16
+            # capture, then one multiply writes the float buffer Whisper gets
+            peak = max(int(audio.max()), -int(audio.min()))
+            out = self._fbuf[:audio.size]
+            np.multiply(audio, np.float32(1.0 / (peak + 1e-8)), dtype=np.float32, out=out)  # epsilon guards all-zero audio
+            return out
+
+    def wait_for_stop_word(self, until: threading.Event) -> bool:
+        """Spot stop words on live audio until one is heard (True) or `until` is set (False)."""
+        return self._stop_words.wait(until)
+
+    def _transcribe(self, data, no_speech_threshold):
+        """Transcribe a capture; releases the capture buffer when done."""
+        try:
+            # Greedy, English-only decoding without timestamps or temperature
+            # fallback: turns are short commands, so accuracy holds and each
+            # call does far less work
+            segments, _ = self.model.transcribe(
+                data,
+                language="en",
+                beam_size=1,
+                vad_filter=False,  # Already gated by webrtcvad
+                condition_on_previous_text=False,
+                without_timestamps=True,
+                temperature=0.0,
+                no_speech_threshold=no_speech_threshold,
+                initial_prompt="The following is a conversation with a human."  # Add context
+            )
+            segments_list = list(segments)
+        finally:
+            self._listen_lock.release()
 
-    def listen(self, seconds=3) -> str:
-        """Listen for speech with improved voice detection and noise filtering."""
-        data, sr = self._record(seconds, self.sample_rate)
-        
-        # Normalize audio
-        normalized_audio = self._normalize_audio(data)
-        
-        # Check if there's any voice activity
-        if not self._detect_voice_activity(normalized_audio):
-            log.info("No significant voice activity detected")
-            return ""
-        
-        # Find the strongest signal segment
-        strongest_signal = self._find_strongest_signal(normalized_audio, sr)
-        
-        # Transcribe the strongest signal with improved parameters
-        segments, _ = self.model.transcribe(
-            strongest_signal,
-            beam_size=5,  # Increased beam size for better accuracy
-            word_timestamps=True,  # Enable word timestamps
-            condition_on_previous_text=True,  # Use previous context
-            initial_prompt="The following is a conversation with a human."  # Add context
-        )
-        segments_list = list(segments)
-        
         if not segments_list:
             return ""
             
@@ -577,87 +731,210 @@ class SpeechRecognizer:
         
         return text
 
+    def listen_async(self, seconds=3, no_speech_threshold=0.6) -> concurrent.futures.Future:
+        """Capture one utterance now and transcribe it in the background.
+
+        Returns a Future for the text. The next capture waits until this
+        transcription is finished, since both share the capture buffer.
+        """
+        self._listen_lock.acquire()
+        try:
+            data = self._record(seconds)
+        except BaseException:
+            self._listen_lock.release()
+            raise
+
+        if data.size < self.min_speech_duration * self.sample_rate:
+            self._listen_lock.release()
+            log.info("No significant voice activity detected")
+            future = concurrent.futures.Future()
+            future.set_result("")
+            return future
+
+        return self._stt_pool.submit(self._transcribe, data, no_speech_threshold)
+
+    def listen(self, seconds=3, no_speech_threshold=0.6) -> str:
+        """Listen for one utterance and transcribe it."""
+        return self.listen_async(seconds, no_speech_threshold).result()
+
+    def close(self):
+        self._stream.stop()
+        self._stream.close()
+
 ###############################################################################
 # ------------------------------  TTS (pyttsx3) ----------------------------- #
 ###############################################################################
+_SENTINEL = object()
+
+# Fixed phrases are rendered to WAV once and replayed from disk / memory
+TTS_CACHE_DIR = "tts_cache_local"
+TTS_CACHE_MAX = 32  # decoded phrases kept in memory
+
 class Speaker:
     def __init__(self, voice_name: str | None = None, rate: int = 150):
         self.voice_name = voice_name
         self.rate = rate
-        self._speaking = False
         self._engine = None
-        self._init_engine()
-        self._speech_complete = threading.Event()
-        self._interrupted = False
+        self._voice_id = None
+        self._q = queue.Queue()
+        self._interrupt = threading.Event()
+        self._done_evt = threading.Event()
+        self._done_evt.set()
+        self._lock = threading.Lock()  # one utterance at a time on the engine
+        self._state_lock = threading.Lock()  # keeps the queue and _done_evt consistent
+        self._cache = OrderedDict()  # (text, voice, rate) -> (samples, sample_rate)
+
+        # A single long-lived worker owns the engine and speaks queued text in order
+        ready = threading.Event()
+        self._worker = threading.Thread(target=self._loop, args=(ready,), daemon=True)
+        self._worker.start()
+        ready.wait()
 
     def _init_engine(self):
-        if self._engine is None:
-            self._engine = pyttsx3.init()
-            if self.voice_name:
-                for v in self._engine.getProperty("voices"):
-                    if self.voice_name.lower() in v.name.lower():
-                        self._engine.setProperty("voice", v.id)
-                        break
-            self._engine.setProperty("rate", self.rate)
-            
-            def on_end(name, completed):
-                self._speaking = False
-                self._speech_complete.set()
-            
-            self._engine.connect('finished-utterance', on_end)
-
-    def _cleanup_engine(self):
-        if self._engine is not None:
-            try:
-                self._engine.stop()
-            finally:
-                self._engine = None
-                self._speaking = False
-                self._speech_complete.set()
-
-    def say(self, text: str):
-        self._speaking = True
-        self._interrupted = False
-        self._speech_complete.clear()
+        # The engine (and its voice table) is set up once and reused for every utterance
+        self._engine = pyttsx3.init()
+        if self.voice_name:
+            for v in self._engine.getProperty("voices"):
+                if self.voice_name.lower() in v.name.lower():
+                    self._voice_id = v.id
+                    break
+        if self._voice_id:
+            self._engine.setProperty("voice", self._voice_id)
+        self._engine.setProperty("rate", self.rate)
+        # Load the speech driver now rather than on the first reply
+        self._engine.say("")
+        self._engine.runAndWait()
+
+    def _loop(self, ready: threading.Event):
         try:
             self._init_engine()
+        finally:
+            ready.set()
+        while True:
+            item = self._q.get()
+            if item is _SENTINEL:
+                break
+            text, cached = item
+            if not self._interrupt.is_set():
+                with self._lock:
+                    if cached:
+                        self._play_cached(text)
+                    else:
+                        self._engine.say(text)
+                        self._engine.runAndWait()
+            with self._state_lock:
+                if self._q.empty():
+                    self._done_evt.set()
+
+    def _cached_audio(self, text: str):
+        """Return (samples, sample_rate) for text, rendering it to WAV on first use."""
+        key = (text, self._voice_id, self.rate)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        digest = hashlib.sha1(f"{self._voice_id}:{self.rate}:{text}".encode()).hexdigest()
+        path = os.path.join(TTS_CACHE_DIR, f"{digest}.wav")
+        if not os.path.exists(path):
+            os.makedirs(TTS_CACHE_DIR, exist_ok=True)
+            self._engine.save_to_file(text, path)
+            self._engine.runAndWait()
+        with wave.open(path, "rb") as w:
+            if w.getsampwidth() != 2:
+                raise wave.Error(f"unsupported sample width {w.getsampwidth()}")
+            samples = np.frombuffer(w.readframes(w.getnframes()), dtype=np.int16)
+            samples = samples.reshape(-1, w.getnchannels())
+            sample_rate = w.getframerate()
+
+        self._cache[key] = (samples, sample_rate)
+        if len(self._cache) > TTS_CACHE_MAX:
+            self._cache.popitem(last=False)
+        return samples, sample_rate
+
+    def _play_cached(self, text: str):
+        try:
+            samples, sample_rate = self._cached_audio(text)
+        except Exception as e:
+            # e.g. a driver that writes AIFF instead of WAV: just speak it live
+            log.warning(f"Could not use cached speech: {e}")
             self._engine.say(text)
             self._engine.runAndWait()
-        finally:
-            self._speaking = False
-            self._speech_complete.set()
-            self._cleanup_engine()
+            return
+        sd.play(samples, sample_rate)
+        sd.wait()
+
+    def say(self, text: str):
+        """Queue text to be spoken after anything already queued."""
+        self._enqueue(text, cached=False)
+
+    def say_cached(self, text: str):
+        """Like say(), but replay a pre-rendered recording of a fixed phrase."""
+        self._enqueue(text, cached=True)
+
+    def _enqueue(self, text: str, cached: bool):
+        with self._state_lock:
+            self._interrupt.clear()
+            self._done_evt.clear()
+            self._q.put((text, cached))
 
     def stop(self):
-        if self._speaking:
-            self._interrupted = True
-            self._cleanup_engine()
-            self._speaking = False
-            self._speech_complete.set()
+        with self._state_lock:
+            if not self.is_speaking():
+                return
+            self._interrupt.set()
+            # Drop anything still waiting to be spoken
+            while True:
+                try:
+                    self._q.get_nowait()
+                except queue.Empty:
+                    break
+            self._engine.stop()
+            sd.stop()  # cached phrases play through sounddevice
+            self._done_evt.set()
 
     def is_speaking(self):
-        return self._speaking
+        return not self._done_evt.is_set()
 
     def is_interrupted(self):
-        return self._interrupted
+        return self._interrupt.is_set()
 
-    def wait_for_completion(self, timeout=0.1):
-        return self._speech_complete.wait(timeout)
+    def wait_for_completion(self, timeout=None):
+        """Block until everything queued has been spoken or speech is stopped."""
+        return self._done_evt.wait(timeout)
 
     def __del__(self):
-        self._cleanup_engine()
+        self._q.put(_SENTINEL)
 
 ###############################################################################
 # ------------------------------  LOCAL LLM  -------------------------------- #
 ###############################################################################
+LLM_ERROR_MESSAGE = "I'm having trouble thinking right now. Please make sure Ollama is running."
+
 class LocalChat:
-    def __init__(self, model_id: str):
+    def __init__(self, model_id: str, client: Client | None = None):
         log.info(f'Connecting to Ollama model "{model_id}" …')
         self.model  = model_id
-        self.client = Client()
+        # Client keeps one pooled HTTP connection to the server for every turn
+        self.client = client or Client()
+        # Short spoken answers: a small context and a hard token cap keep
+        # prefill and decode cheap
+        self.options = {
+            "num_ctx"    : 2048,  # system prompt plus max_turns short exchanges
+            "num_predict": 120,
+            "temperature": 0.5,
+            "top_k"      : 20,
+            "num_thread" : os.cpu_count(),
+        }
+        # The last max_turns exchanges follow the system prompt. They only grow
+        # at the end, so the model stays resident with the conversation's KV
+        # prefix cached and each turn prefills just the new question.
+        self.max_turns = 4
+        self.turns = deque(maxlen=2 * self.max_turns)
+        self.completed = False  # whether the last reply() ran to the end of the stream
         try:
-            # Test connection with a simple ping
-            self.client.chat(model=self.model, messages=[{"role": "user", "content": "ping"}])
+            # Load the model now and keep it resident (keep_alive=-1) so no
+            # turn pays a cold load after Ollama's idle timeout
+            self.client.generate(model=self.model, prompt="", keep_alive=-1)
             log.info("✅ Connected to Ollama")
         except Exception as e:
             log.error(f"❌ Unable to reach Ollama: {str(e)}")
@@ -667,17 +944,221 @@ class LocalChat:
             log.error("3. You can access http://127.0.0.1:11434")
             raise
 
-    def reply(self, user_text: str) -> str:
+    def reply(self, user_text: str):
+        """Yield the reply piece by piece as Ollama generates it."""
         messages = [
-            {"role": "system", "content": SYSTEM_TONE.format(user=user_text)},
+            # Identical system prompt every turn, so Ollama reuses its cached prefix
+            {"role": "system", "content": SYSTEM_TONE},
+            *self.turns,
             {"role": "user",   "content": user_text},
         ]
+        parts = []
+        self.completed = False
         try:
-            result = self.client.chat(model=self.model, messages=messages)
-            return result["message"]["content"].strip()
+            for chunk in self.client.chat(
+                model=self.model,
+                messages=messages,
+                stream=True,
+                keep_alive=-1,
+                options=self.options,
+            ):
+                content = chunk["message"]["content"]
+                if content:
+                    parts.append(content)
+                    yield content
+            self.completed = True
         except Exception as exc:
             log.error(f"LLM error: {exc}")
-            return "I'm having trouble thinking right now. Please make sure Ollama is running."
+            if not parts:
+                yield LLM_ERROR_MESSAGE
+        finally:
+            # An interrupted reply is kept as far as it was generated
+            if parts:
+                self.add_turn(user_text, "".join(parts))
+
+    def add_turn(self, user_text: str, reply: str):
+        """Append one exchange to the context sent with later questions."""
+        self.turns.extend((
+            {"role": "user",      "content": user_text},
+            {"role": "assistant", "content": reply},
+        ))
+
+###############################################################################
+# ----------------------------  RESPONSE CACHE  ----------------------------- #
+###############################################################################
+# Repeated or paraphrased questions are answered from a cache keyed by the
+# question's embedding (all-minilm is MiniLM-L6-v2 served by Ollama)
+EMBED_MODEL              = "all-minilm"
+SEMANTIC_CACHE_THRESHOLD = 0.92
+SEMANTIC_CACHE_MAX       = 500
+SEMANTIC_CACHE_TTL       = 30 * 24 * 3600  # entries unused for 30 days are dropped
+
+class SemanticCache:
+    """Replies keyed by the embedding of the question that produced them.
+
+    Embeddings are L2-normalised and kept as rows of one float32 matrix, so a
+    lookup is a single matrix-vector product. Every entry is written through
+    to SQLite (embeddings as float16 blobs), so the cache survives restarts
+    and crashes. Entries unused for longer than the TTL are dropped at
+    startup; once full, the least recently used entry is replaced.
+    """
+
+    def __init__(self, client: Client, path: str = "response_cache_local.sqlite3",
+                 max_entries: int = SEMANTIC_CACHE_MAX, threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 ttl: float = SEMANTIC_CACHE_TTL):
+        self.client = client
+        self.path = path
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl = ttl
+        self.enabled = True  # turned off if the embedding model is unavailable
+        self.embeddings: np.ndarray | None = None  # allocated on first add
+        self.keys: list[str] = []     # prompt hash per row
+        self.replies: list[str] = []
+        self._rows: dict[str, int] = {}
+        self._last_used = np.zeros(max_entries)  # per row, for LRU replacement
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+        self._load()
+
+    # ---------- persistence ---------- #
+    def _load(self):
+        try:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS answer_cache ("
+                "hash TEXT PRIMARY KEY, embedding BLOB, user TEXT, answer TEXT, ts REAL, hits INTEGER)"
+            )
+            # ts is the last use, so this is both the TTL and the size bound
+            self._db.execute("DELETE FROM answer_cache WHERE ts < ?", (time.time() - self.ttl,))
+            self._db.execute(
+                "DELETE FROM answer_cache WHERE hash NOT IN "
+                "(SELECT hash FROM answer_cache ORDER BY ts DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+            self._db.commit()
+            rows = self._db.execute("SELECT hash, embedding, answer, ts FROM answer_cache").fetchall()
+        except sqlite3.Error as exc:
+            log.error(f"Response cache will not be saved: {exc}")
+            self._db = None
+            return
+        if not rows:
+            return
+        try:
+            vectors = np.frombuffer(b"".join(r[1] for r in rows), dtype=np.float16).reshape(len(rows), -1)
+        except ValueError as exc:  # e.g. rows from a different embedding model
+            log.error(f"Could not load response cache: {exc}")
+            return
+        self.embeddings = np.zeros((self.max_entries, vectors.shape[1]), dtype=np.float32)
+        self.embeddings[:len(rows)] = vectors
+        self.keys = [r[0] for r in rows]
+        self.replies = [r[2] for r in rows]
+        self._rows = {key: row for row, key in enumerate(self.keys)}
+        self._last_used[:len(rows)] = [r[3] for r in rows]
+
+    def _write(self, *statements):
+        if self._db is None:
+            return
+        try:
+            for sql, params in statements:
+                self._db.execute(sql, params)
+            self._db.commit()
+        except sqlite3.Error as exc:
+            log.error(f"Could not save response cache: {exc}")
+
+    # ---------- public API ---------- #
+    def embed(self, text: str) -> np.ndarray | None:
+        if not self.enabled:
+            return None
+        try:
+            result = self.client.embed(model=EMBED_MODEL, input=text, keep_alive=-1)
+        except Exception as exc:
+            log.warning(f"Response cache disabled, embedding failed: {exc} (try 'ollama pull {EMBED_MODEL}')")
+            self.enabled = False
+            return None
+        vector = np.asarray(result["embeddings"][0], dtype=np.float32)
+        return vector / (np.linalg.norm(vector) + 1e-8)
+
+    def lookup(self, query: np.ndarray) -> str | None:
+        with self._lock:
+            if not self.keys:
+                return None
+            scores = self.embeddings[:len(self.keys)] @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            now = time.time()
+            self._last_used[best] = now
+            self._write(("UPDATE answer_cache SET ts = ?, hits = hits + 1 WHERE hash = ?", (now, self.keys[best])))
+            return self.replies[best]
+
+    def add(self, query: np.ndarray, prompt: str, reply: str):
+        key = hashlib.sha1(prompt.strip().lower().encode()).hexdigest()
+        now = time.time()
+        statements = []
+        with self._lock:
+            if self.embeddings is None:
+                self.embeddings = np.zeros((self.max_entries, query.size), dtype=np.float32)
+            row = self._rows.get(key)
+            if row is None:
+                if len(self.keys) < self.max_entries:
+                    row = len(self.keys)
+                    self.keys.append(key)
+                    self.replies.append(reply)
+                else:
+                    row = int(np.argmin(self._last_used))
+                    evicted = self.keys[row]
+                    del self._rows[evicted]
+                    statements.append(("DELETE FROM answer_cache WHERE hash = ?", (evicted,)))
+            self.embeddings[row] = query
+            self.keys[row], self.replies[row] = key, reply
+            self._rows[key] = row
+            self._last_used[row] = now
+            statements.append((
+                "INSERT OR REPLACE INTO answer_cache VALUES (?, ?, ?, ?, ?, 0)",
+                (key, query.astype(np.float16).tobytes(), prompt, reply, now),
+            ))
+            self._write(*statements)
+
+class CachedChat:
+    """LocalChat with near-duplicate questions answered from a SemanticCache."""
+
+    def __init__(self, chat: LocalChat):
+        self.chat = chat
+        self.cache = SemanticCache(chat.client)
+
+    def reply(self, user_text: str):
+        """Yield the cached reply in one piece, or stream and remember a fresh one."""
+        query = None
+        # With earlier turns in the prompt the reply may depend on them ("why?"),
+        # so only questions asked without context are looked up or stored
+        if not self.chat.turns and not NO_CACHE_RE.search(user_text):
+            query = self.cache.embed(user_text)
+            if query is not None:
+                cached = self.cache.lookup(query)
+                if cached is not None:
+                    log.info("Semantic cache hit")
+                    self.chat.add_turn(user_text, cached)
+                    yield cached
+                    return
+
+        parts = []
+        chunks = self.chat.reply(user_text)
+        try:
+            for chunk in chunks:
+                parts.append(chunk)
+                yield chunk
+        finally:
+            chunks.close()
+
+        # An interrupted reply is closed mid-stream and never gets here; one cut
+        # short by an Ollama error does, but is not marked completed
+        reply = "".join(parts).strip()
+        if query is not None and reply and self.chat.completed:
+            self.cache.add(query, user_text, reply)
+
+# Sentence boundary: terminal punctuation followed by whitespace
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
 
 ###############################################################################
 # --------------------------  CONVERSATION HISTORY -------------------------- #
@@ -685,44 +1166,89 @@ class LocalChat:
 class ConversationHistory:
     def __init__(self, max_history=10):
         self.history      = deque(maxlen=max_history)
-        self.history_file = "conversation_history_local.json"
+        # Append-only log, one JSON object per line
+        self.history_file = "conversation_history_local.jsonl"
+        self.version      = 0  # bumped on every new entry
         self.load_history()
 
+        # New entries are appended by a background writer so a turn never waits on disk
+        self._pending = queue.Queue()
+        threading.Thread(target=self._write_loop, daemon=True).start()
+        atexit.register(self.flush)
+
     # basic CRUD helpers
     def add_interaction(self, user_input: str, robot_response: str):
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.history.append({
+        entry = {
             "timestamp": timestamp,
             "user"     : user_input,
             "robot"    : robot_response,
-        })
-        self.save_history()
+        }
+        self.history.append(entry)
+        self.version += 1
+        self._pending.put(entry)
 
+    def get_first(self):
+        return self.history[0] if self.history else None
     def get_last(self):
         return self.history[-1] if self.history else None
     def get_all(self):
         return list(self.history)
     def get_recent(self, n=3):
-        return list(self.history)[-n:]
+        return list(islice(self.history, max(0, len(self.history) - n), None))
 
-    def save_history(self):
-        try:
-            with open(self.history_file, "w") as f:
-                json.dump(list(self.history), f, indent=2)
-        except Exception as e:
-            log.error(f"Could not save history: {e}")
+    def flush(self):
+        """Block until every queued entry has been written."""
+        self._pending.join()
+
+    def _write_loop(self):
+        while True:
+            entry = self._pending.get()
+            try:
+                with open(self.history_file, "a", buffering=1) as f:
+                    f.write(json.dumps(entry) + "\n")
+            except Exception as e:
+                log.error(f"Could not save history: {e}")
+            finally:
+                self._pending.task_done()
 
     def load_history(self):
         try:
-            if os.path.exists(self.history_file):
-                with open(self.history_file, "r") as f:
-                    self.history = deque(json.load(f), maxlen=self.history.maxlen)
+            f = open(self.history_file, "r")
+        except FileNotFoundError:
+            return
+        try:
+            with f:
+                # Only the last max_history lines are kept, and only those are parsed
+                tail = deque(f, maxlen=self.history.maxlen)
         except Exception as e:
             log.error(f"Could not load history: {e}")
+            return
+        # A crash mid-append leaves a torn last line; skip it, keep the rest
+        for line in tail:
+            try:
+                self.history.append(json.loads(line))
+            except ValueError:
+                log.warning(f"Skipping unreadable line in {self.history_file}")
+        if tail and not tail[-1].endswith("\n"):
+            # Terminate the partial line so the next append starts on its own
+            try:
+                with open(self.history_file, "a") as f:
+                    f.write("\n")
+            except OSError as e:
+                log.error(f"Could not repair history: {e}")
 
 ###############################################################################
 # ------------------------------  CORE ROBOT -------------------------------- #
 ###############################################################################
+# Marks the end of one reply on the TTS queue
+_END_OF_TURN = object()
+
+GREETING_MESSAGE  = "Hello! I am HMND-01. How can I help you today?"
+NO_SPEECH_MESSAGE = "I didn't catch that. Did you say something?"
+GOODBYE_MESSAGE   = "Goodbye! Say 'hey robot' when you need me again."
+CANNED_PHRASES    = {GREETING_MESSAGE, NO_SPEECH_MESSAGE, GOODBYE_MESSAGE}
+
 class RainbowRobot:
     def __init__(self, recognizer: SpeechRecognizer, speaker: Speaker, brain: LocalChat):
         self.recognizer = recognizer
@@ -731,15 +1257,27 @@ class RainbowRobot:
         self.state = {"awake": False}
         self.running = True
         self.last_response = ""
-        self._should_stop = False
         self.history = ConversationHistory()
+        self._hist_answers = {}  # formatted recall answers for _hist_version
+        self._hist_version = -1
         self.silence_threshold = 0.01  # Adjust this value based on your environment
         self.silence_duration = 0  # Track silence duration
 
+        # Pipeline: capture+STT -> LLM -> TTS, each stage on its own thread.
+        # interrupt_evt is set by the STT stage when a stop word is heard and
+        # honoured by the other two; _turn_done is set once a reply has been spoken.
+        self.stt_q = queue.Queue(maxsize=1)
+        self.tts_q = queue.Queue(maxsize=8)
+        self.interrupt_evt = threading.Event()
+        self._turn_done = threading.Event()
+        self._turn_done.set()
+
         # initial UI
         self._set_ui(status="sleeping")
 
         log.info("🤖 Rainbow Robot initialised – waiting for wake word …")
+        if not STOP_WORD_MODELS:
+            log.info(f"No STOP_WORD_MODELS set – say '{STOP_WORD_BUILTINS[0].replace('_', ' ')}' to interrupt me.")
 
     # UI helper
     def _set_ui(self, **kwargs):
@@ -750,148 +1288,221 @@ class RainbowRobot:
         log.info("Shutting down …")
         self.running = False
         self.speaker.stop()
+        self.recognizer.close()
         self._set_ui(status="sleeping")
         log.info("Goodbye 👋")
 
+    def _start_turn(self, kind: str, text: str):
+        """Hand one input to the LLM stage and mark a reply as in progress."""
+        self.interrupt_evt.clear()
+        self._turn_done.clear()
+        self.stt_q.put((kind, text))
+
     def check_for_wake_word(self):
-        heard = self.recognizer.listen(2).lower()
+        # Blocks on the VAD until someone actually speaks, so an idle robot
+        # neither polls nor runs Whisper on silence
+        heard = self.recognizer.listen(None, no_speech_threshold=0.3).lower()
         if heard:
             log.info(f"Heard: {heard}")
-            if any(w in heard for w in WAKE_WORDS):
+            if "wake" in classify(heard):
                 self.state["awake"] = True
                 log.info("🎯 Wake word detected!")
                 self._set_ui(status="listening", message=heard)
-                welcome_message = "Hello! I am HMND-01. How can I help you today?"
-                self._set_ui(response=welcome_message)
-                self.speaker.say(welcome_message)
-                # Add the wake word interaction to history
-                self.history.add_interaction(heard, welcome_message)
+                self._start_turn("wake", heard)
                 return True
         return False
 
-    # speak with interrupt capability
-    def speak_with_interrupt(self, text: str):
-        self._should_stop = False
-        self._set_ui(status="speaking", response=text)
-
-        def check_for_interruption():
-            while self.speaker.is_speaking():
-                try:
-                    heard = self.recognizer.listen(1).lower()
-                    if heard and any(w in heard for w in STOP_WORDS):
-                        log.info("🛑 Interrupt word detected!")
-                        self._should_stop = True
-                        self.speaker.stop()
-                        interruption_message = "I've been interrupted. How can I help you?"
-                        self._set_ui(status="listening", response=interruption_message)
-                        break
-                except Exception:
-                    continue
-
-        # Start speaking in a separate thread
-        speak_thread = threading.Thread(target=lambda: self.speaker.say(text))
-        speak_thread.start()
-
-        # Start interrupt listener in a separate thread
-        interrupt_thread = threading.Thread(target=check_for_interruption)
-        interrupt_thread.start()
-
-        # Wait for speaking to complete or be interrupted
-        speak_thread.join()
-        interrupt_thread.join(timeout=0.5)
-
-        # Update UI based on whether speech was interrupted
-        if self.speaker.is_interrupted():
-            self._set_ui(status="listening")
-        else:
-            self._set_ui(status="listening")
-
-        return self.speaker.is_interrupted()
+    # interrupt capability
+    def _listen_for_stop(self):
+        """Spot interrupt words until the reply in progress has finished."""
+        if not self.recognizer.wait_for_stop_word(self._turn_done):
+            return
+        log.info("🛑 Interrupt word detected!")
+        self.interrupt_evt.set()
+        self.speaker.stop()
+        interruption_message = "I've been interrupted. How can I help you?"
+        self._set_ui(status="listening", response=interruption_message)
+        self._turn_done.wait()
 
     # optional history queries
-    def history_query(self, user_input: str):
-        lower = user_input.lower()
-        if "first interaction" in lower:
-            first = self.history.get_all()[0] if self.history.get_all() else None
-            if first:
-                return f"Our first interaction was at {first['timestamp']}: you said '{first['user']}' and I replied '{first['robot']}'."
-            return "I don't have any earlier interactions."
-        if "last interaction" in lower:
-            last = self.history.get_last()
-            if last:
-                return f"Our last interaction was at {last['timestamp']}: you said '{last['user']}' and I replied '{last['robot']}'."
-            return "We haven't spoken yet."
-        if "recent interactions" in lower:
-            recent = self.history.get_recent(3)
-            if recent:
-                parts = [f"At {r['timestamp']} – you: '{r['user']}' | me: '{r['robot']}'" for r in recent]
-                return "Here are our recent chats:\n" + "\n".join(parts)
-        if "repeat" in lower and self.last_response:
-            return self.last_response
+    def _recall_first(self):
+        first = self.history.get_first()
+        if first:
+            return f"Our first interaction was at {first['timestamp']}: you said '{first['user']}' and I replied '{first['robot']}'."
+        return "I don't have any earlier interactions."
+
+    def _recall_last(self):
+        last = self.history.get_last()
+        if last:
+            return f"Our last interaction was at {last['timestamp']}: you said '{last['user']}' and I replied '{last['robot']}'."
+        return "We haven't spoken yet."
+
+    def _recall_recent(self):
+        recent = self.history.get_recent(3)
+        if recent:
+            parts = [f"At {r['timestamp']} – you: '{r['user']}' | me: '{r['robot']}'" for r in recent]
+            return "Here are our recent chats:\n" + "\n".join(parts)
         return None
 
-    # main loop
-    def run(self):
+    def _repeat_last(self):
+        return self.last_response or None
+
+    # Handlers keyed by the HISTORY_PHRASES tag, in priority order
+    _HIST_HANDLERS = {
+        "first"   : _recall_first,
+        "last"    : _recall_last,
+        "previous": _recall_last,
+        "recent"  : _recall_recent,
+        "repeat"  : _repeat_last,
+    }
+
+    def history_query(self, words: set):
+        """Answer a history question from the tags classify() found, if any."""
+        kind = next((k for k in self._HIST_HANDLERS if k in words), None)
+        if kind is None:
+            return None
+        if kind == "repeat":
+            return self._repeat_last()
+        # Recall answers only change when the history does, so they are
+        # formatted once per history version
+        if self._hist_version != self.history.version:
+            self._hist_answers.clear()
+            self._hist_version = self.history.version
+        if kind not in self._hist_answers:
+            self._hist_answers[kind] = self._HIST_HANDLERS[kind](self)
+        return self._hist_answers[kind]
+
+    # ------ pipeline stages
+    def _stt_loop(self):
+        """Capture + STT stage: wake word, user turns, and stop words while replying."""
         while self.running:
+            if not self._turn_done.is_set():
+                self._listen_for_stop()
+                continue
+
             if not self.state["awake"]:
-                if self.check_for_wake_word():
-                    continue
-                time.sleep(0.1)
+                self.check_for_wake_word()
                 continue
 
             self._set_ui(status="listening")
             log.info("🎤 Listening for your question …")
-            user = self.recognizer.listen(10)
+            # Transcription finishes in the background while this stage goes
+            # straight back to spotting stop words for the new turn
+            self._start_turn("turn", self.recognizer.listen_async(10))
 
-            if not user:
-                log.info("❌ No significant speech detected")
-                no_speech_message = "I didn't catch that. Did you say something?"
-                self._set_ui(message="", response=no_speech_message)
-                self.speak_with_interrupt(no_speech_message)
-                continue
-
-            log.info(f"👤 You said: {user}")
-            self._set_ui(message=user)
+    def _llm_loop(self):
+        """LLM stage: turn each input into sentences for the TTS stage."""
+        while self.running:
+            kind, user = self.stt_q.get()
+            try:
+                self._respond(kind, user)
+            except Exception as e:
+                log.error(f"Error handling turn: {e}")
+            finally:
+                self.tts_q.put(_END_OF_TURN)
+
+    def _respond(self, kind: str, user):
+        if kind == "turn":
+            user = user.result()  # transcription of the captured question
+
+        if kind == "wake":
+            self.tts_q.put(GREETING_MESSAGE)
+            # Add the wake word interaction to history
+            self.history.add_interaction(user, GREETING_MESSAGE)
+            return
+
+        if not user:
+            log.info("❌ No significant speech detected")
+            self._set_ui(message="")
+            self.tts_q.put(NO_SPEECH_MESSAGE)
+            return
+
+        log.info(f"👤 You said: {user}")
+        self._set_ui(message=user)
+
+        # Check for stop words in user input
+        words = classify(user)
+        if "stop" in words:
+            log.info("🛑 Stop word detected in user input")
+            self.speaker.stop()
+            self._set_ui(status="listening", response="")
+            return
+
+        if "quit" in words:
+            log.info("👋 Quit word detected")
+            self.tts_q.put(GOODBYE_MESSAGE)
+            self.history.add_interaction(user, GOODBYE_MESSAGE)
+            self.state["awake"] = False
+            return
+
+        # history queries
+        hist = self.history_query(words)
+        if hist:
+            log.info("📜 History query")
+            self.tts_q.put(hist)
+            return
+
+        # LLM answer, handed to the TTS stage sentence by sentence as it streams in
+        log.info("🤔 Thinking …")
+        self._set_ui(status="thinking")
+        parts = []
+        buffer = ""
+        chunks = self.brain.reply(user)
+        try:
+            for chunk in chunks:
+                if self.interrupt_evt.is_set():
+                    break
+                buffer += chunk
+                *complete, buffer = _SENTENCE_END.split(buffer)
+                for sentence in complete:
+                    parts.append(sentence)
+                    self.tts_q.put(sentence)
+            if buffer.strip() and not self.interrupt_evt.is_set():
+                parts.append(buffer.strip())
+                self.tts_q.put(buffer.strip())
+        finally:
+            chunks.close()
 
-            # Check for stop words in user input
-            if any(w in user.lower() for w in STOP_WORDS):
-                log.info("🛑 Stop word detected in user input")
-                self.speaker.stop()
-                self._should_stop = True
-                self._set_ui(status="listening", response="")
-                continue
+        answer = " ".join(parts)
+        self.last_response = answer
+        log.info(f"🤖 {answer}")
 
-            if any(q in user.lower() for q in QUIT_WORDS):
-                log.info("👋 Quit word detected")
-                goodbye_message = "Goodbye! Say 'hey robot' when you need me again."
-                self._set_ui(response=goodbye_message)
-                self.speak_with_interrupt(goodbye_message)
-                self.history.add_interaction(user, goodbye_message)
-                self.state["awake"] = False
-                self._set_ui(status="sleeping")
-                continue
+        # store
+        self.history.add_interaction(user, answer)
+        if self.interrupt_evt.is_set():
+            log.info("Ready for new input …")
 
-            # history queries
-            hist = self.history_query(user)
-            if hist:
-                log.info("📜 History query")
-                self._set_ui(response=hist)
-                self.speak_with_interrupt(hist)
+    def _tts_loop(self):
+        """TTS stage: speak sentences as they arrive until the turn ends."""
+        spoken = []
+        while self.running:
+            sentence = self.tts_q.get()
+            if sentence is _END_OF_TURN:
+                self.speaker.wait_for_completion()
+                spoken = []
+                if not self.state["awake"]:
+                    self._set_ui(status="sleeping")
+                elif not self.interrupt_evt.is_set():
+                    self._set_ui(status="listening")
+                self._turn_done.set()
                 continue
+            if self.interrupt_evt.is_set():
+                continue  # drop what is left of an interrupted reply
+            spoken.append(sentence)
+            self._set_ui(status="speaking", response=" ".join(spoken))
+            # Queued behind the sentence still playing, so there is no gap
+            if sentence in CANNED_PHRASES:
+                self.speaker.say_cached(sentence)
+            else:
+                self.speaker.say(sentence)
 
-            # LLM answer
-            log.info("🤔 Thinking …")
-            self._set_ui(status="thinking")
-            answer = self.brain.reply(user)
-            self.last_response = answer
-            log.info(f"🤖 {answer}")
-
-            # store & speak
-            self.history.add_interaction(user, answer)
-            self._set_ui(response=answer)
-            interrupted = self.speak_with_interrupt(answer)
-            if interrupted:
-                log.info("Ready for new input …")
+    # main loop
+    def run(self):
+        """Start the pipeline stages; this thread only waits for shutdown."""
+        for stage in (self._stt_loop, self._llm_loop, self._tts_loop):
+            threading.Thread(target=stage, daemon=True).start()
+        while self.running:
+            time.sleep(0.5)
 
 ###############################################################################
 # --------------------------------  SIGNALS ---------------------------------#
@@ -912,30 +1523,32 @@ signal.signal(signal.SIGINT, signal_handler)
 def main():
     parser = argparse.ArgumentParser(description="Rainbow Robot (fully local)")
     parser.add_argument("--voice",      default="en_GB-alba-low", help="Piper voice ID / path")
-    parser.add_argument("--stt_model",  default="base.en",        help="Whisper model (tiny.en, base.en, ...)")
+    parser.add_argument("--stt_model",  default="base.en",        help="Whisper model (tiny.en, base.en, distil-small.en, ...)")
+    parser.add_argument("--stt_compute_type", default=None,       help="CTranslate2 compute type (default: int8_float16 on cuda, int8 on cpu)")
     parser.add_argument("--llm",        default="llama3",         help="Ollama model name")
     parser.add_argument("--device",     default="cpu",           help="cuda | cpu")
     args = parser.parse_args()
 
-    # Check if Ollama is running before starting
+    # Check if Ollama is running before starting. The check goes through the
+    # same pooled client LocalChat uses, so its connection is reused for every turn
+    ollama_client = Client()
     try:
-        import requests
-        response = requests.get("http://127.0.0.1:11434/api/tags")
-        if response.status_code != 200:
-            log.error("❌ Ollama server is not responding properly")
-            log.error("Please make sure Ollama is running (run 'ollama serve' in terminal)")
-            sys.exit(1)
-    except requests.exceptions.ConnectionError:
+        ollama_client.list()
+    except ConnectionError:
         log.error("❌ Cannot connect to Ollama server")
         log.error("Please make sure Ollama is running (run 'ollama serve' in terminal)")
         sys.exit(1)
+    except Exception as e:
+        log.error(f"❌ Ollama server is not responding properly: {e}")
+        log.error("Please make sure Ollama is running (run 'ollama serve' in terminal)")
+        sys.exit(1)
 
     # Set up signal handler for Ctrl+C
     signal.signal(signal.SIGINT, signal_handler)
 
-    recognizer = SpeechRecognizer(args.stt_model, args.device)
+    recognizer = SpeechRecognizer(args.stt_model, args.device, args.stt_compute_type)
     speaker = Speaker(voice_name=None)     # pyttsx3 version; pass a name if you like
-    brain = LocalChat(args.llm)
+    brain = CachedChat(LocalChat(args.llm, ollama_client))
 
     # Start the Flask UI server
     start_ui_server()
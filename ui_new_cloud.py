@@ -9,7 +9,7 @@ This single file runs two main components:
     Flask UI polls once per second via /get_display.
 
 Before running make sure you have the following installed:
-  pip install flask openai SpeechRecognition pygame pyaudio python-dotenv
+  pip install flask openai SpeechRecognition pygame pyaudio python-dotenv numpy sounddevice
 and create a .env file with your OpenAI key:
   OPENAI_API_KEY="sk‑..."
 
@@ -19,6 +19,7 @@ Run with:
 Visit http://localhost:5000 in your browser to view the UI.
 """
 import argparse
+import io
 import json
 import logging
 import os
@@ -29,7 +30,9 @@ from collections import deque
 from datetime import datetime
 from typing import Optional
 
+import numpy as np
 import pygame
+import sounddevice as sd
 import speech_recognition as sr
 from flask import Flask, jsonify, render_template_string
 from logging.handlers import RotatingFileHandler
@@ -54,6 +57,13 @@ SILENCE_TIMEOUT = 20  # Reduced from 60 to 20 seconds for more natural interacti
 PHRASE_TIMEOUT = 10   # Reduced from 30 to 10 seconds for faster response
 MAX_SILENCE_ATTEMPTS = 3  # Reduced from 5 to 3 for quicker sleep mode
 
+# Interrupt listener: voice energy is checked on every 20 ms microphone block,
+# and a short phrase is only sent for recognition once it crosses the threshold
+INTERRUPT_SAMPLE_RATE = 16_000
+INTERRUPT_BLOCK = 320          # 20 ms
+INTERRUPT_RMS = 300            # int16 RMS that counts as someone talking
+INTERRUPT_PHRASE_SECONDS = 0.7
+
 # Replace the following strings with your real content.
 ROBOTICS_KNOWLEDGE = """[Previous robotics knowledge content …]"""
 ROBOT_IDENTITY = """[Previous robot identity content …]"""
@@ -882,6 +892,7 @@ def stop_system(go_to_sleep=False):
     
     # Set flags
     interrupted = True
+    playback_done.set()  # release speak() even if no end event arrives
     
     # Stop any ongoing audio
     try:
@@ -1013,19 +1024,40 @@ def get_response(user_text: str) -> str:
 ## --- Energy-based interrupt listener (moved up) --------------
 
 def _energy_interrupt():
-    """Stop playback on any short burst of voice energy while robot is speaking."""
-    with sr.Microphone() as mic:
-        r = sr.Recognizer()
-        r.energy_threshold = 50          # very sensitive
-        r.dynamic_energy_threshold = False
-        r.pause_threshold = 0.1
-        r.non_speaking_duration = 0.05
-        r.adjust_for_ambient_noise(mic, duration=0.2)
-        stop_keywords = ("stop", "halt", "pause", "quiet", "silence", "wait", "cancel")
-        while pygame.mixer.music.get_busy() and not interrupted:
-            try:
-                # Listen up to 1 s but abort if no speech after 0.3 s – balances speed and accuracy
-                audio = r.listen(mic, timeout=0.5, phrase_time_limit=0.7)
+    """Stop playback when a stop keyword is spoken while the robot is speaking.
+
+    The sounddevice callback checks the RMS of each block on the audio thread
+    and, once someone is talking, collects a short phrase; only that phrase is
+    sent for recognition, so this thread sleeps until there is speech.
+    """
+    r = sr.Recognizer()
+    phrase = np.empty(int(INTERRUPT_PHRASE_SECONDS * INTERRUPT_SAMPLE_RATE), dtype=np.int16)
+    filled = 0
+    phrase_ready = threading.Event()
+    stop_keywords = ("stop", "halt", "pause", "quiet", "silence", "wait", "cancel")
+
+    def on_block(indata, frames, time_info, status):
+        nonlocal filled
+        if phrase_ready.is_set():
+            return  # previous phrase still being recognised
+        block = indata[:, 0]
+        if filled == 0:
+            samples = block.astype(np.float32)
+            if np.dot(samples, samples) < INTERRUPT_RMS ** 2 * samples.size:
+                return
+        n = min(block.size, phrase.size - filled)
+        phrase[filled:filled + n] = block[:n]
+        filled += n
+        if filled == phrase.size:
+            phrase_ready.set()
+
+    try:
+        with sd.InputStream(samplerate=INTERRUPT_SAMPLE_RATE, blocksize=INTERRUPT_BLOCK,
+                            channels=1, dtype="int16", callback=on_block):
+            while not playback_done.is_set() and not interrupted:
+                if not phrase_ready.wait(0.1):
+                    continue
+                audio = sr.AudioData(phrase.tobytes(), INTERRUPT_SAMPLE_RATE, 2)
                 try:
                     text = r.recognize_google(audio, language="en-US").lower()
                     logger.info(f"Energy-interrupt heard: {text}")
@@ -1034,13 +1066,13 @@ def _energy_interrupt():
                         trigger_stop()
                         break
                 except sr.UnknownValueError:
-                    # Sound detected but not understood – ignore
-                    continue
-            except sr.WaitTimeoutError:
-                continue
-            except Exception as exc:
-                logger.error(f"Energy interrupt error: {exc}")
-                continue
+                    pass  # sound detected but not understood – ignore
+                except Exception as exc:
+                    logger.error(f"Energy interrupt error: {exc}")
+                filled = 0
+                phrase_ready.clear()
+    except Exception as exc:
+        logger.error(f"Energy interrupt error: {exc}")
 
 # ------------------------------------------------------------------
 
@@ -1078,26 +1110,30 @@ def speak(text: str) -> bool:
         # Update status while saving and preparing audio
         update_display(status="Processing", response="Preparing audio playback...")
         
-        tmp_path = "temp_speech.mp3"
-        logger.info(f"Saving speech to temporary file: {tmp_path}")
-        with open(tmp_path, "wb") as fh:
-            fh.write(response.content)
-        
-        logger.info("Loading audio file into pygame mixer...")
-        pygame.mixer.music.load(tmp_path)
+        # pygame reads the MP3 straight from memory; audio_buf must stay
+        # alive until the music is unloaded
+        audio_buf = io.BytesIO(response.content)
+        logger.info("Loading audio into pygame mixer...")
+        pygame.mixer.music.load(audio_buf, "mp3")
         
         # Update display to show we're speaking
         update_display(status="Speaking", response=text)
         
         logger.info("Starting audio playback...")
+        playback_done.clear()
         pygame.mixer.music.play()
         
         # Launch energy-based interrupt listener NOW so it runs during playback
         threading.Thread(target=_energy_interrupt, daemon=True).start()
         
-        # Wait for audio to finish or interruption
-        while pygame.mixer.music.get_busy() and not interrupted:
-            time.sleep(0.1)
+        # Wait for audio to finish or interruption (stop_system sets it too)
+        playback_done.wait()
+        # An end event left over from the previous track can land after the
+        # clear() above; keep waiting while this one is still playing
+        while not interrupted and pygame.mixer.music.get_busy():
+            playback_done.clear()
+            if pygame.mixer.music.get_busy():
+                playback_done.wait()
             
         if interrupted:
             logger.info("Speech was interrupted by user")
@@ -1118,9 +1154,6 @@ def speak(text: str) -> bool:
         is_speaking = False  # Always clear the flag
         try:
             pygame.mixer.music.unload()
-            if os.path.exists(tmp_path):
-                os.remove(tmp_path)
-                logger.info("Temporary audio file cleaned up")
         except Exception as e:
             logger.error(f"Error during cleanup: {e}")
     return interrupted
@@ -1197,6 +1230,38 @@ except Exception as e:
         logger.error(f"Failed to initialize pygame mixer with alternative settings: {e}")
         raise
 
+# pygame posts MUSIC_END when playback finishes (or is stopped); a pump thread
+# turns it into playback_done so speak() can block instead of polling get_busy().
+# The event queue needs the video subsystem, which needs no window on "dummy".
+# SDL only pumps events on the thread that initialised video, so the pump
+# thread does both.
+MUSIC_END = pygame.USEREVENT + 1
+playback_done = threading.Event()
+
+def _pump_music_events(ready: threading.Event):
+    try:
+        pygame.display.init()
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed([MUSIC_END])
+        pygame.mixer.music.set_endevent(MUSIC_END)
+    except Exception as exc:
+        logger.error(f"No music end events, polling playback instead: {exc}")
+        ready.set()
+        while True:
+            time.sleep(0.1)
+            if not pygame.mixer.music.get_busy():
+                playback_done.set()
+    ready.set()
+    while True:
+        # A late event from a stopped track must not end the one now playing
+        if pygame.event.wait().type == MUSIC_END and not pygame.mixer.music.get_busy():
+            playback_done.set()
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+_pump_ready = threading.Event()
+threading.Thread(target=_pump_music_events, args=(_pump_ready,), daemon=True).start()
+_pump_ready.wait()
+
 # Test audio system
 try:
     pygame.mixer.music.load("test.mp3")  # This will fail, but we just want to check if the system is working